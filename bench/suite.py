@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# suite.py
+# github.com/deadbits/prompt-serve
+# benchmark API reads and uploads in-process plus the validate/stats CLIs on synthetic repositories
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+
+sys.path.append(os.path.join(ROOT_DIR, 'tools'))
+
+import yamlio
+from synth import generate_repo, make_prompt
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 4),
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(pct(50), 3),
+        'p95_ms': round(pct(95), 3),
+        'p99_ms': round(pct(99), 3),
+        'max_ms': round(latencies[-1] * 1000, 3)
+    }
+
+
+async def drive(client, requests: list, concurrency: int, responses: list = None) -> dict:
+    # a fixed number of workers pull from one list so at most `concurrency` requests are in flight
+    latencies = []
+    errors = 0
+    it = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for method, url, kwargs in it:
+            start = time.perf_counter()
+            r = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if r.status_code >= 400:
+                errors += 1
+            elif responses is not None:
+                responses.append(r)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result = summarize(latencies, time.perf_counter() - start)
+    result['errors'] = errors
+    return result
+
+
+async def wait_for_commit(client, repo_name: str, ticket: str):
+    while True:
+        status = (await client.get(f'/{repo_name}/_commits/{ticket}')).json()
+        if status['status'] != 'pending':
+            return status
+        await asyncio.sleep(0.01)
+
+
+async def bench_api(api, repo_path: str, prompts: list, args) -> dict:
+    import httpx
+
+    repo_name = os.path.basename(repo_path)
+    # not the stream generate_repo used, uploads would reuse the uuids of existing prompts
+    rng = random.Random(f'api-{args.seed}')
+    results = {}
+
+    # first index build for this repo, including writing its snapshot
+    start = time.perf_counter()
+    await api.run_blocking(api.get_index, repo_path)
+    results['index_seconds'] = round(time.perf_counter() - start, 4)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        picks = [rng.choice(prompts) for _ in range(args.requests)]
+
+        # first pass fills the document cache, the second measures warm reads
+        for label in ('cold', 'warm'):
+            reqs = [('GET', f'/{repo_name}/_name/{name}', {}) for name, _ in picks]
+            results[f'get_name_{label}'] = await drive(client, reqs, args.concurrency)
+
+        reqs = [('GET', f'/{repo_name}/_uuid/{prompt_uuid}', {}) for _, prompt_uuid in picks]
+        results['get_uuid'] = await drive(client, reqs, args.concurrency)
+
+        reqs = []
+        for i in range(args.uploads):
+            content = yamlio.dump(make_prompt(rng, len(prompts) + i), sort_keys=False)
+            files = {'file': (f'upload-{args.seed}-{i:06d}.yml', content)}
+            reqs.append(('POST', f'/{repo_name}', {'files': files}))
+
+        responses = []
+        results['post'] = await drive(client, reqs, args.concurrency, responses)
+
+        # uploads are acknowledged before they are committed, time the commit backlog separately
+        if responses:
+            start = time.perf_counter()
+            api.commits.flush()
+            for r in responses:
+                await wait_for_commit(client, repo_name, r.json()['ticket'])
+            results['commit_drain_seconds'] = round(time.perf_counter() - start, 4)
+
+    return results
+
+
+async def bench_all_api(api, repos: dict, args) -> dict:
+    results = {}
+    try:
+        for count, (repo_path, prompts) in repos.items():
+            print(f'(status) benchmarking API on {count} prompts', file=sys.stderr)
+            results[count] = await bench_api(api, repo_path, prompts, args)
+    finally:
+        await api.shutdown()
+    return results
+
+
+def time_command(cmd: list) -> float:
+    # None when the command fails, e.g. an optional dependency of the tool is missing
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        print(f'(error) {" ".join(cmd[1:3])} failed: {proc.stderr.strip().splitlines()[-1:]}', file=sys.stderr)
+        return None
+    return round(time.perf_counter() - start, 4)
+
+
+def bench_cli(repo_path: str, args) -> dict:
+    schema = os.path.join(ROOT_DIR, 'schema.yml')
+    validate = [sys.executable, os.path.join('tools', 'validate.py'), '-s', schema, '-d', repo_path]
+    stats = [sys.executable, os.path.join('tools', 'contentctl.py'), '-s', repo_path]
+
+    results = {
+        'validate_seconds': time_command(validate),
+        f'validate_jobs{args.jobs}_seconds': time_command(validate + ['-j', str(args.jobs)]),
+        'stats_seconds': time_command(stats)
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = validate + ['--cache', os.path.join(tmp, 'validate-cache.json')]
+        time_command(cache)
+        results['validate_cached_seconds'] = time_command(cache)
+
+    return results
+
+
+def write_config(home: str, path: str):
+    with open(path, 'w') as f:
+        f.write(f'[main]\nrepo_path = {home}\n\n[server]\n'
+                f'schema_path = {os.path.join(ROOT_DIR, "schema.yml")}\n'
+                # the watcher and a short commit window would only add noise here
+                'watch = off\n'
+                'commit_window = 0.5\n')
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the API server and tools on synthetic prompt repositories.')
+
+    parser.add_argument(
+        '-n', '--prompts',
+        help='repository sizes to benchmark',
+        type=int,
+        nargs='+',
+        default=[1000]
+    )
+
+    parser.add_argument(
+        '-r', '--requests',
+        help='GET requests per read benchmark',
+        type=int,
+        default=2000
+    )
+
+    parser.add_argument(
+        '-u', '--uploads',
+        help='POST requests in the upload benchmark',
+        type=int,
+        default=200
+    )
+
+    parser.add_argument(
+        '-c', '--concurrency',
+        help='requests in flight at once',
+        type=int,
+        default=16
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        help='processes for the parallel validate.py run',
+        type=int,
+        default=os.cpu_count() or 1
+    )
+
+    parser.add_argument(
+        '--seed',
+        help='random seed for repositories and request order',
+        type=int,
+        default=0
+    )
+
+    parser.add_argument(
+        '--skip-api',
+        help='only time the CLIs',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--skip-cli',
+        help='only benchmark the API',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help='write JSON results to this file instead of stdout'
+    )
+
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'libyaml': yamlio.LIBYAML,
+        'settings': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': []
+    }
+
+    with tempfile.TemporaryDirectory() as home:
+        repos = {}
+        for count in args.prompts:
+            repo_path = os.path.join(home, f'prompts-{count}')
+            print(f'(status) generating {count} prompts', file=sys.stderr)
+            repos[count] = (repo_path, generate_repo(repo_path, count, args.seed))
+
+        # CLIs run first, the API benchmark adds uploads to every repo
+        results = {count: {'prompts': count} for count in repos}
+        if not args.skip_cli:
+            for count, (repo_path, _) in repos.items():
+                print(f'(status) timing CLIs on {count} prompts', file=sys.stderr)
+                results[count]['cli'] = bench_cli(repo_path, args)
+
+        if not args.skip_api:
+            # api.py reads its config at import time, one import serves every repository size
+            config_path = os.path.join(home, 'ps.conf')
+            write_config(home, config_path)
+            os.environ['PS_CONFIG'] = config_path
+            sys.path.insert(0, os.path.join(ROOT_DIR, 'server'))
+            import api
+
+            for count, result in asyncio.run(bench_all_api(api, repos, args)).items():
+                results[count]['api'] = result
+
+        report['results'] = list(results.values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# synth.py
+# github.com/deadbits/prompt-serve
+# generate a git repository of synthetic prompts that validate against schema.yml
+import os
+import sys
+import uuid
+import random
+import argparse
+import subprocess
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import yamlio
+
+
+CATEGORIES = ('cot', 'qa', 'summarization', 'classification', 'extraction', 'translation', 'coding', 'chat')
+PROVIDERS = {
+    'openai': ('gpt-3.5-turbo', 'gpt-4'),
+    'anthropic': ('claude-2', 'claude-instant-1'),
+    'cohere': ('command', 'command-light')
+}
+TAGS = ('reasoning', 'few-shot', 'zero-shot', 'agent', 'retrieval', 'json', 'safety', 'eval', 'chat', 'summary',
+        'classification', 'translation', 'code', 'math', 'writing', 'support')
+WORDS = ('answer', 'question', 'context', 'document', 'summary', 'user', 'step', 'reason', 'carefully', 'list',
+         'explain', 'format', 'response', 'text', 'input', 'output', 'example', 'style', 'brief', 'detail')
+
+
+def prompt_name(i: int) -> str:
+    # flat layout, names map directly to /{repo}/_name/{name}
+    return f'prompt-{i:06d}'
+
+
+def make_prompt(rng: random.Random, i: int) -> dict:
+    provider = rng.choice(list(PROVIDERS))
+    variables = rng.sample(['user_query', 'context', 'document', 'language'], rng.randint(1, 3))
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+
+    return {
+        'title': f'Synthetic prompt {i}',
+        'uuid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        'description': f'Generated prompt {i} for benchmarks: {words[:120]}',
+        'category': rng.choice(CATEGORIES),
+        'provider': provider,
+        'model': rng.choice(PROVIDERS[provider]),
+        'model_settings': {'temperature': round(rng.random(), 2), 'max_tokens': rng.choice([256, 512, 1024])},
+        'prompt': ' '.join('{' + v + '}' for v in variables) + f'\n{words}\n',
+        'input_variables': variables,
+        'tags': rng.sample(TAGS, rng.randint(1, 4))
+    }
+
+
+def generate_repo(repo_path: str, count: int, seed: int = 0) -> list:
+    # writes count prompts and commits them, returns [(name, uuid), ...]
+    rng = random.Random(seed)
+    os.makedirs(repo_path, exist_ok=True)
+    prompts = []
+
+    for i in range(count):
+        data = make_prompt(rng, i)
+        name = prompt_name(i)
+        with open(os.path.join(repo_path, f'{name}.yml'), 'w') as f:
+            yamlio.dump(data, f, sort_keys=False)
+        prompts.append((name, data['uuid']))
+
+    git = ['git', '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+    subprocess.run(['git', 'init', '-q', repo_path], check=True)
+    subprocess.run(git + ['add', '-A'], cwd=repo_path, check=True)
+    subprocess.run(git + ['commit', '-q', '-m', f'{count} synthetic prompts'], cwd=repo_path, check=True)
+    return prompts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a git repository of synthetic prompts.')
+
+    parser.add_argument(
+        '-o', '--output',
+        help='directory to create the repository in',
+        required=True
+    )
+
+    parser.add_argument(
+        '-n', '--prompts',
+        help='number of prompts to generate',
+        type=int,
+        default=1000
+    )
+
+    parser.add_argument(
+        '--seed',
+        help='random seed, the same seed always produces the same repository',
+        type=int,
+        default=0
+    )
+
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        print(f'(error) {args.output} is not empty')
+        sys.exit(1)
+
+    generate_repo(args.output, args.prompts, args.seed)
+    print(f'(status) wrote {args.prompts} prompts to {args.output}')
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# yaml_parse.py
+# github.com/deadbits/prompt-serve
+# compare per-file parse time of the pure-Python and libyaml loaders on a prompt directory
+import os
+import sys
+import time
+import argparse
+import yaml
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import yamlio
+from corpus import find_prompts
+
+
+def time_loader(contents, loader, rounds):
+    # best of several rounds, reported per file
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for content in contents:
+            yaml.load(content, Loader=loader)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / len(contents)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark YAML parsing of prompt files.')
+
+    parser.add_argument(
+        '-d', '--directory',
+        help='directory of prompts to parse',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prompts')
+    )
+
+    parser.add_argument(
+        '-r', '--rounds',
+        help='number of passes over the directory',
+        type=int,
+        default=20
+    )
+
+    args = parser.parse_args()
+
+    contents = []
+    for file_path in find_prompts(args.directory):
+        with open(file_path, 'rb') as f:
+            contents.append(f.read())
+
+    if not contents:
+        print(f'(error) no prompts found in {args.directory}')
+        sys.exit(1)
+
+    before = time_loader(contents, yaml.SafeLoader, args.rounds)
+    after = time_loader(contents, yamlio.SafeLoader, args.rounds)
+
+    print(f'files:   {len(contents)}')
+    print(f'libyaml: {yamlio.LIBYAML}')
+    print(f'before:  {before * 1e6:.1f} us/file (SafeLoader)')
+    print(f'after:   {after * 1e6:.1f} us/file ({yamlio.SafeLoader.__name__})')
+    print(f'speedup: {before / after:.1f}x')
@@ -1,19 +1,63 @@
 import os
 import sys
-import yaml
+import time
+import json
+import asyncio
+import functools
+import itertools
+import threading
 import aiofiles
 import configparser
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query
-from git import Repo
-from uuid import UUID
-from typing import Optional
-from starlette.responses import FileResponse
+from collections import defaultdict
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Header, Request
+from uuid import UUID, uuid4
+from typing import Optional, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import Response, JSONResponse, StreamingResponse
 from fastapi.params import Path
 
+# shared helpers from tools/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import yamlio
+from snapshot import ensure_snapshot
+from index import PromptIndex
+from cache import TemplateCache, CacheEntry
+from repos import RepoRegistry
+from commits import CommitQueue, commit_files
+from schema import SchemaValidator
+from revisions import RevisionStore
+from bulk import is_archive, safe_relpath, read_archive, iter_uploads, limit_items, LimitExceeded
+from render import TemplateCompiler, RenderError
+from watcher import RepoWatcher, DELETED, RESCAN
+from metrics import REGISTRY, stage
+
 
 app = FastAPI()
 
 
+class BatchRequest(BaseModel):
+    names: List[str] = []
+    uuids: List[UUID] = []
+    raw: bool = False
+
+
+class RenderRequest(BaseModel):
+    name: Optional[str] = None
+    uuid: Optional[UUID] = None
+    ref: Optional[str] = None
+    variables: Dict[str, Any] = {}
+
+
+class BatchRenderRequest(BaseModel):
+    name: Optional[str] = None
+    uuid: Optional[UUID] = None
+    ref: Optional[str] = None
+    variables: List[Dict[str, Any]] = []
+
+
 class Config:
     def __init__(self, config_file):
         # check if config file exists
@@ -27,97 +71,786 @@ class Config:
         self.config = configparser.ConfigParser()
         self.config.read(self.config_file)
 
-    def get(self, section, key):
+    def get(self, section, key, default=None):
         # get config option by section and key name
-        answer = None
+        answer = default
 
         try:
             answer = self.config.get(section, key)
         except:
-            print(f'config file missing option: {section} {key}', 'error')
+            if default is None:
+                print(f'config file missing option: {section} {key}', 'error')
 
         return answer
 
 
-config = Config('../ps.conf')
+# PS_CONFIG points the server at another config, e.g. for benchmarks
+config = Config(os.environ.get('PS_CONFIG', '../ps.conf'))
 global REPO_HOME
 REPO_HOME = config.get('main', 'repo_path')
 
+# git repositories under REPO_HOME, opened once
+repos = RepoRegistry(REPO_HOME)
+
+# parsed prompt documents shared by every repo
+cache = TemplateCache(max_size=int(config.get('server', 'cache_size', 1024)), loader=yamlio.load)
+
+# prompts at pinned revisions, read from the git object store
+revisions = RevisionStore(repos, yamlio.load, max_blobs=int(config.get('server', 'cache_size', 1024)))
+
+# prompt templates parsed once into a render-ready form
+compiler = TemplateCompiler(max_size=int(config.get('server', 'cache_size', 1024)))
+
+# sent with every prompt read, clients revalidate with the ETag by default
+CACHE_CONTROL = config.get('server', 'cache_control', 'no-cache')
+
+# reads pinned to a full commit sha never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# per-repo uuid indexes, keyed by repo path
+indexes = {}
+indexes_lock = threading.Lock()
+# held while a repo's index is first built, only by requests to that repo
+index_build_locks = defaultdict(threading.Lock)
+
+# uuid checks and the renames that make uploads visible run under one lock per repo,
+# so two uploads can't both pass the check with the same uuid
+upload_locks = defaultdict(threading.Lock)
+upload_locks_lock = threading.Lock()
+
+# schema.yml is loaded once and shared by every upload
+validator = SchemaValidator(config.get('server', 'schema_path', '../schema.yml'), loader=yamlio.load)
+
+# load indexes from compiled snapshots at startup instead of parsing every file
+USE_SNAPSHOTS = config.get('server', 'index_snapshots', 'true').lower() in ['true', 't', 'yes', '1']
+
+# uploads are streamed to disk in chunks and rejected with a 413 once they pass these limits
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_SIZE = int(config.get('server', 'max_upload_size', 1048576))
+MAX_ARCHIVE_SIZE = int(config.get('server', 'max_archive_size', 67108864))
+# bulk uploads are also capped on file count and on the total bytes they extract to
+MAX_BULK_FILES = int(config.get('server', 'max_bulk_files', 10000))
+MAX_BULK_SIZE = int(config.get('server', 'max_bulk_size', 268435456))
+
+# uploads are grouped into batched commits by a background thread
+commits = CommitQueue(
+    repos,
+    window=float(config.get('server', 'commit_window', 2.0)),
+    max_files=int(config.get('server', 'commit_batch_size', 100))
+)
+
+# filesystem watcher that keeps indexes current without rescans: auto, inotify, poll or off
+WATCH_MODE = config.get('server', 'watch', 'auto').lower()
+watcher = None
+if WATCH_MODE != 'off':
+    watcher = RepoWatcher(
+        WATCH_MODE,
+        interval=float(config.get('server', 'watch_interval', 2.0)),
+        full_scan_interval=float(config.get('server', 'watch_full_scan', 60.0))
+    )
+
+# blocking work (yaml parsing, directory walks, git) runs here instead of on the event loop
+executor = ThreadPoolExecutor(max_workers=int(config.get('server', 'workers', 8)), thread_name_prefix='ps-worker')
+
+# per-route request metrics, exposed with stage timings and cache stats at /_metrics
+REQUESTS = REGISTRY.counter('prompt_serve_requests_total', 'HTTP requests handled', ('method', 'route', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram('prompt_serve_request_duration_seconds', 'HTTP request latency', ('method', 'route'))
+
+
+def collect_cache_metrics():
+    # runs on the event loop, copying the dict is atomic so indexes_lock is never waited on here
+    stats = cache.stats()
+    sizes = [({'repo': os.path.basename(repo_path)}, len(index.entries)) for repo_path, index in list(indexes.items())]
+
+    return [
+        ('prompt_serve_cache_hits_total', 'counter', 'Document cache hits', [({}, stats['hits'])]),
+        ('prompt_serve_cache_misses_total', 'counter', 'Document cache misses', [({}, stats['misses'])]),
+        ('prompt_serve_cache_evictions_total', 'counter', 'Documents evicted from the cache', [({}, stats['evictions'])]),
+        ('prompt_serve_cache_invalidations_total', 'counter', 'Cached documents dropped after a change', [({}, stats['invalidations'])]),
+        ('prompt_serve_cache_entries', 'gauge', 'Documents in the cache', [({}, stats['size'])]),
+        ('prompt_serve_revision_blobs', 'gauge', 'Blobs cached for pinned revisions', [({}, revisions.stats()['blobs'])]),
+        ('prompt_serve_compiled_templates', 'gauge', 'Compiled templates in the cache', [({}, compiler.stats()['size'])]),
+        ('prompt_serve_indexed_prompts', 'gauge', 'Prompts in each repo index', sizes)
+    ]
+
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
 
 def verify_dir_is_repo(repo_path: str) -> bool:
+    return repos.get(repo_path) is not None
+
+
+def get_head(repo_path: str):
     try:
-        repo = Repo(repo_path)
-        return True
+        return repos.head(repo_path)
     except:
+        return None
+
+
+def get_document(repo_path: str, file_path: str) -> CacheEntry:
+    # indexed prompts skip the stat, their index entry was just checked against the file
+    if safe_relpath(os.path.relpath(file_path, repo_path)) is not None:
+        index = get_index(repo_path)
+        entry = index.get_by_path(file_path)
+        if entry is not None:
+            return index.document(entry)
+
+    cache.check_head(repo_path, get_head(repo_path))
+    return cache.get_entry(file_path)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
         return False
+    if if_none_match.strip() == '*':
+        return True
+
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+def prompt_response(entry: CacheEntry, raw: bool, if_none_match: Optional[str],
+                    cache_control: str = CACHE_CONTROL) -> Response:
+    # strong ETag from the git blob sha, the raw representation gets its own tag
+    etag = f'"{entry.blob_sha}-raw"' if raw else f'"{entry.blob_sha}"'
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if raw:
+        return JSONResponse({'prompt': entry.data.get('prompt')}, headers=headers)
+
+    return Response(entry.content, media_type='application/x-yaml', headers=headers)
+
+
+def load_index_snapshot(repo_path: str):
+    # compiled index from contentctl.py --compile, rebuilt here when HEAD moved
+    if not USE_SNAPSHOTS:
+        return None
+
+    try:
+        with stage('snapshot'):
+            return ensure_snapshot(repo_path, get_head(repo_path))
+    except Exception as err:
+        print(f'failed to load index snapshot for {repo_path}: {err}', 'error')
+        return None
+
+
+def get_index(repo_path: str) -> PromptIndex:
+    with indexes_lock:
+        index = indexes.get(repo_path)
+        if index is not None:
+            return index
+        build_lock = index_build_locks[repo_path]
+
+    # a new repo is scanned under its own lock, requests to other repos never wait for it
+    with build_lock:
+        with indexes_lock:
+            index = indexes.get(repo_path)
+        if index is not None:
+            return index
+
+        index = PromptIndex(repo_path, cache, load_index_snapshot(repo_path))
+        index.refresh_on_miss = watcher is None
+        with indexes_lock:
+            indexes[repo_path] = index
+
+    # outside indexes_lock, the watcher thread takes it while applying changes
+    if watcher is not None:
+        watcher.watch(repo_path)
+    return index
+
+
+def apply_change(repo_path: str, kind: str, file_path: str):
+    # called from the watcher thread for every added, modified or deleted prompt,
+    # and with RESCAN when changes may have been missed
+    with indexes_lock:
+        index = indexes.get(repo_path)
+    if index is None:
+        return
+
+    if kind == RESCAN:
+        index.refresh()
+    elif kind == DELETED:
+        index.remove_file(file_path)
+    else:
+        index.update_file(file_path)
+
+
+def build_indexes():
+    for repo_path in repos.scan():
+        get_index(repo_path)
+
+
+def fsync_dir(dir_path: str):
+    # make a rename durable, not just the file contents
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def upload_lock(repo_path: str) -> threading.Lock:
+    with upload_locks_lock:
+        return upload_locks[repo_path]
+
+
+def uuid_conflict(index: PromptIndex, repo_path: str, file_path: str, f_uuid: str):
+    existing = index.by_uuid.get(f_uuid) if f_uuid else None
+    if existing is not None and existing != file_path:
+        return f'UUID {f_uuid} is already used by {os.path.relpath(existing, repo_path)}'
+    return None
+
+
+def check_prompt(index: PromptIndex, repo_path: str, file_path: str, content: bytes):
+    # returns (uuid, errors) for a prompt about to be written to file_path, call with upload_lock held
+    try:
+        data = yamlio.load(content)
+    except yamlio.YAMLError as err:
+        return None, [f'failed to parse YAML: {err}']
+
+    errors = validator.validate(data)
+    f_uuid = str(data.get('uuid')) if isinstance(data, dict) else None
+
+    conflict = uuid_conflict(index, repo_path, file_path, f_uuid)
+    if conflict:
+        errors.append(conflict)
+
+    return f_uuid, errors
+
+
+def upload_tmp_path(file_path: str) -> str:
+    # next to the target so the final rename stays on one filesystem, never matches *.yml
+    dir_path, name = os.path.split(file_path)
+    return os.path.join(dir_path, f'.{name}.{uuid4().hex}.upload')
+
+
+def install_upload(repo_path: str, file_path: str, tmp_path: str) -> list:
+    # validate the spooled upload and move it into the repo, returns the errors when it is rejected
+    try:
+        with open(tmp_path, 'rb') as f:
+            content = f.read()
+            os.fsync(f.fileno())
+
+        index = get_index(repo_path)
+        with upload_lock(repo_path):
+            _, errors = check_prompt(index, repo_path, file_path, content)
+            if errors:
+                return errors
+
+            os.replace(tmp_path, file_path)
+            index.update_file(file_path)
+        fsync_dir(os.path.dirname(file_path))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return []
+
+
+async def stream_upload(file: UploadFile, tmp_path: str, max_size: int):
+    # copy the upload to tmp_path one chunk at a time, it is never held in memory as a whole
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f'{file.filename} is larger than {max_size} bytes')
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def discard_staged(staged: list):
+    for tmp_path, _, _ in staged:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def stage_bulk(repo_path: str, items):
+    # validate (name, content) pairs one at a time and spool the valid ones to temp files in the repo,
+    # returns per-file results plus (tmp path, file path, uuid) for each; nothing is visible in the tree yet
+    index = get_index(repo_path)
+    results = []
+    staged = []
+    seen = {}
+    rejected = False
+
+    try:
+        for name, content in items:
+            result = {'filename': name, 'status': 'valid', 'errors': []}
+            results.append(result)
+
+            rel_path = safe_relpath(name)
+            if rel_path is None:
+                result['status'] = 'invalid'
+                result['errors'].append('file name is not allowed')
+                rejected = True
+                continue
+
+            if not rel_path.endswith('.yml'):
+                result['status'] = 'skipped'
+                continue
+
+            file_path = os.path.join(repo_path, rel_path)
+            with upload_lock(repo_path):
+                f_uuid, errors = check_prompt(index, repo_path, file_path, content)
+
+            if f_uuid in seen:
+                errors.append(f'UUID {f_uuid} is also used by {seen[f_uuid]}')
+            elif f_uuid:
+                seen[f_uuid] = name
+
+            if errors:
+                result['status'] = 'invalid'
+                result['errors'].extend(errors)
+                rejected = True
+
+            # once anything is invalid the upload is rejected, stop writing but keep validating
+            if rejected:
+                continue
+
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = upload_tmp_path(file_path)
+            staged.append((tmp_path, file_path, f_uuid))
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+    except:
+        discard_staged(staged)
+        raise
+
+    if rejected:
+        discard_staged(staged)
+        staged = []
+
+    return results, staged
+
+
+def restore_staged(index: PromptIndex, installed: list):
+    # put back the prompts a failed bulk commit overwrote and remove the ones it added
+    for file_path, backup in reversed(installed):
+        if backup is not None:
+            os.replace(backup, file_path)
+            index.update_file(file_path)
+        else:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            index.remove_file(file_path)
+
+
+def commit_staged(repo_path: str, staged: list):
+    # returns (commit sha, whether a commit was made, errors),
+    # uuids are checked again since other uploads may have landed after staging
+    index = get_index(repo_path)
+    files = [file_path for _, file_path, _ in staged]
+
+    with upload_lock(repo_path):
+        errors = [uuid_conflict(index, repo_path, file_path, f_uuid) for _, file_path, f_uuid in staged]
+        errors = [error for error in errors if error]
+        if errors:
+            return None, False, errors
+
+        # (file path, hard link to the prompt it replaced) so a failed commit can be undone
+        installed = []
+        try:
+            for tmp_path, file_path, _ in staged:
+                backup = None
+                if os.path.exists(file_path):
+                    backup = upload_tmp_path(file_path)
+                    os.link(file_path, backup)
+                os.replace(tmp_path, file_path)
+                installed.append((file_path, backup))
+                index.update_file(file_path)
+            for dir_path in {os.path.dirname(file_path) for file_path in files}:
+                fsync_dir(dir_path)
+
+            sha, created = commit_files(repos, repo_path, files, f'Add {len(files)} files through API (bulk)')
+        except:
+            restore_staged(index, installed)
+            raise
+
+    for _, backup in installed:
+        if backup is not None:
+            os.remove(backup)
+    return sha, created, []
+
+
+def fetch_batch(repo_path: str, names: list, uuids: list, raw: bool) -> list:
+    index = get_index(repo_path)
+    requested = [('name', name) for name in names] + [('uuid', str(u)) for u in uuids]
+    results = []
 
+    for kind, key in requested:
+        entry = None
+        if kind == 'uuid':
+            entry = index.get_by_uuid(key)
+        elif safe_relpath(key) is not None:
+            entry = index.get_by_name(key)
 
-def parse_yaml(file_path: str) -> dict:
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return data
+        if entry is None:
+            results.append({kind: key, 'error': 'not found'})
+            continue
+
+        data = index.document(entry).data
+        result = {
+            kind: key,
+            'path': os.path.relpath(entry.path, repo_path)
+        }
+        if raw:
+            result['prompt'] = data.get('prompt')
+        else:
+            result['data'] = data
+        results.append(result)
+
+    return results
+
+
+def find_at_ref(repo_path: str, ref: str, name: str = None, prompt_uuid: str = None):
+    commit = revisions.resolve(repo_path, ref)
+    if commit is None:
+        return None, None
+
+    if name is not None:
+        return commit, revisions.get_by_name(repo_path, commit, name)
+    return commit, revisions.get_by_uuid(repo_path, commit, prompt_uuid)
+
+
+async def pinned_response(repo_path: str, ref: str, raw: bool, if_none_match: Optional[str],
+                          name: str = None, prompt_uuid: str = None) -> Response:
+    commit, entry = await run_blocking(find_at_ref, repo_path, ref, name=name, prompt_uuid=prompt_uuid)
+
+    if commit is None:
+        raise HTTPException(status_code=404, detail=f'Unknown revision: {ref}')
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f'File not found at revision {ref}: {name or prompt_uuid}')
+
+    cache_control = IMMUTABLE_CACHE_CONTROL if commit.hexsha == ref else CACHE_CONTROL
+    return prompt_response(entry, raw, if_none_match, cache_control)
+
+
+def search_facets(repo_path: str, filters: dict, offset: int, limit: int) -> dict:
+    total, entries = get_index(repo_path).query(filters, offset, limit)
+    prompts = []
+
+    for entry in entries:
+        path = os.path.relpath(entry.path, repo_path)
+        prompts.append({'name': path[:-len('.yml')], 'path': path, 'uuid': entry.uuid, **entry.meta})
+
+    return {'total': total, 'offset': offset, 'limit': limit, 'prompts': prompts}
+
+
+def search_text(repo_path: str, query: str, offset: int, limit: int) -> dict:
+    total, hits = get_index(repo_path).search(query, offset, limit)
+    prompts = []
+
+    for entry, score in hits:
+        path = os.path.relpath(entry.path, repo_path)
+        prompts.append({'name': path[:-len('.yml')], 'path': path, 'uuid': entry.uuid,
+                        'title': entry.meta.get('title'), 'score': round(score, 4)})
+
+    return {'total': total, 'offset': offset, 'limit': limit, 'prompts': prompts}
+
+
+def resolve_template(repo_path: str, name: str = None, prompt_uuid: str = None, ref: str = None):
+    # cached document for a name or uuid, optionally at a pinned revision
+    if ref:
+        _, entry = find_at_ref(repo_path, ref, name=name, prompt_uuid=prompt_uuid)
+        return entry
+
+    index = get_index(repo_path)
+    if name is not None:
+        found = index.get_by_name(name) if safe_relpath(name) is not None else None
+    else:
+        found = index.get_by_uuid(prompt_uuid)
+
+    if found is None:
+        return None
+    return index.document(found)
+
+
+def render_template(repo_path: str, request, batch: bool = False):
+    if (request.name is None) == (request.uuid is None):
+        raise HTTPException(status_code=400, detail='exactly one of name or uuid is required')
+
+    prompt_uuid = str(request.uuid) if request.uuid is not None else None
+    entry = resolve_template(repo_path, request.name, prompt_uuid, request.ref)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f'Prompt not found: {request.name or prompt_uuid}')
+
+    try:
+        template = compiler.get(entry)
+    except RenderError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+
+    if not batch:
+        try:
+            return {'prompt': template.render(request.variables)}
+        except RenderError as err:
+            raise HTTPException(status_code=422, detail=str(err))
+
+    results = []
+    for values in request.variables:
+        try:
+            results.append({'prompt': template.render(values)})
+        except RenderError as err:
+            results.append({'error': str(err)})
+    return {'prompts': results}
+
+
+def find_by_uuid(repo_path: str, prompt_uuid: str):
+    index = get_index(repo_path)
+    entry = index.get_by_uuid(prompt_uuid)
+    return index.document(entry) if entry is not None else None
+
+
+@app.middleware('http')
+async def record_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # label by route template, not the raw path, so uuids and names don't explode the series
+        route = request.scope.get('route')
+        path = route.path if route is not None else 'unmatched'
+        REQUESTS.inc(method=request.method, route=path, status=status)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path)
+
+
+@app.on_event('startup')
+async def startup():
+    await run_blocking(build_indexes)
+    if watcher is not None:
+        watcher.subscribe(apply_change)
+        watcher.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    if watcher is not None:
+        await run_blocking(watcher.stop)
+    await run_blocking(commits.close)
+    executor.shutdown(wait=True)
+
+
+@app.get('/_metrics')
+async def metrics():
+    return Response(REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.get('/_cache')
+async def cache_stats():
+    stats = cache.stats()
+    stats['revisions'] = revisions.stats()
+    stats['templates'] = compiler.stats()
+    return stats
 
 
 @app.post('/{repo_name}')
 async def upload_file(repo_name: str, file: UploadFile = File(...)):
     try:
         repo_path = os.path.join(REPO_HOME, repo_name)
-        if not verify_dir_is_repo(repo_path):
+        if not await run_blocking(verify_dir_is_repo, repo_path):
             raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
 
-        file_path = os.path.join(repo_path, file.filename)
-        
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-
-        repo = Repo(repo_path)
-        repo.git.add([file_path])
-        repo.index.commit('Add file through API')
-        msg = {'filename': file.filename, 'message': 'file uploaded and committed successfully'}
+        rel_path = safe_relpath(file.filename or '')
+        if rel_path is None or not rel_path.endswith('.yml'):
+            raise HTTPException(status_code=400, detail=f'file name is not allowed: {file.filename}')
+
+        file_path = os.path.join(repo_path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # nothing reaches the repo until the whole upload is on disk and valid
+        tmp_path = upload_tmp_path(file_path)
+        await stream_upload(file, tmp_path, MAX_UPLOAD_SIZE)
+        errors = await run_blocking(install_upload, repo_path, file_path, tmp_path)
+        if errors:
+            raise HTTPException(status_code=422, detail={'filename': file.filename, 'errors': errors})
+
+        ticket = commits.submit(repo_path, [file_path])
+        msg = {'filename': file.filename, 'message': 'file uploaded and queued for commit', 'ticket': ticket.id}
         
         return msg
-    
+
+    except HTTPException:
+        raise
+    except Exception as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+
+@app.post('/{repo_name}/_bulk')
+async def bulk_upload(repo_name: str, files: List[UploadFile] = File(None), archive: UploadFile = File(None)):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    if archive is not None and not is_archive(archive.filename):
+        raise HTTPException(status_code=400, detail=f'unsupported archive type: {archive.filename}')
+
+    # members are read, validated and spooled one at a time, the upload is never held in memory
+    items = iter_uploads(files or [], MAX_UPLOAD_SIZE)
+    if archive is not None:
+        items = itertools.chain(items, read_archive(archive.file, archive.filename, MAX_ARCHIVE_SIZE, MAX_UPLOAD_SIZE))
+    items = limit_items(items, archive.filename if archive is not None else 'upload', MAX_BULK_FILES, MAX_BULK_SIZE)
+
+    try:
+        results, staged = await run_blocking(stage_bulk, repo_path, items)
+    except LimitExceeded as err:
+        raise HTTPException(status_code=413, detail=str(err))
     except Exception as err:
+        raise HTTPException(status_code=400, detail=f'failed to read upload: {err}')
+
+    if not results:
+        raise HTTPException(status_code=400, detail='no files uploaded')
+
+    # all or nothing, a single bad prompt rejects the whole upload
+    if any(result['status'] == 'invalid' for result in results):
+        raise HTTPException(status_code=422, detail={'message': 'validation failed, nothing was committed', 'files': results})
+
+    if not staged:
+        raise HTTPException(status_code=400, detail={'message': 'no prompt files found', 'files': results})
+
+    try:
+        sha, created, errors = await run_blocking(commit_staged, repo_path, staged)
+    except Exception as err:
+        await run_blocking(discard_staged, staged)
         raise HTTPException(status_code=400, detail=str(err))
 
+    if errors:
+        await run_blocking(discard_staged, staged)
+        raise HTTPException(status_code=422, detail={'message': 'validation failed, nothing was committed', 'errors': errors})
+
+    # re-posting prompts identical to HEAD makes no commit
+    return {'commit': sha, 'status': 'committed' if created else 'unchanged', 'files': results}
+
+
+@app.post('/{repo_name}/_batch')
+async def read_batch(repo_name: str, request: BatchRequest, format: str = Query('json', pattern='^(json|ndjson)$')):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    results = await run_blocking(fetch_batch, repo_path, request.names, request.uuids, request.raw)
+
+    if format == 'ndjson':
+        lines = (json.dumps(jsonable_encoder(result)) + '\n' for result in results)
+        return StreamingResponse(lines, media_type='application/x-ndjson')
+
+    return {'prompts': results}
+
+
+@app.get('/{repo_name}/_filter')
+async def filter_prompts(repo_name: str,
+                         category: List[str] = Query([]), provider: List[str] = Query([]),
+                         model: List[str] = Query([]), tag: List[str] = Query([]), pack: List[str] = Query([]),
+                         offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=1000)):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    filters = {'category': category, 'provider': provider, 'model': model, 'tags': tag, 'packs': pack}
+    return await run_blocking(search_facets, repo_path, filters, offset, limit)
+
+
+@app.get('/{repo_name}/_search')
+async def search_prompts(repo_name: str, q: str = Query(..., min_length=1),
+                         offset: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=1000)):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    return await run_blocking(search_text, repo_path, q, offset, limit)
+
+
+@app.get('/{repo_name}/_facets')
+async def list_facets(repo_name: str):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    index = await run_blocking(get_index, repo_path)
+    return index.facets()
+
+
+@app.post('/{repo_name}/_render')
+async def render_prompt(repo_name: str, request: RenderRequest):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    return await run_blocking(render_template, repo_path, request)
+
+
+@app.post('/{repo_name}/_render/batch')
+async def render_prompt_batch(repo_name: str, request: BatchRenderRequest):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    if not await run_blocking(verify_dir_is_repo, repo_path):
+        raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
+
+    return await run_blocking(render_template, repo_path, request, batch=True)
+
+
+@app.get('/{repo_name}/_commits/{ticket_id}')
+async def commit_status(repo_name: str, ticket_id: str):
+    repo_path = os.path.join(REPO_HOME, repo_name)
+    status = commits.status(repo_path, ticket_id)
+
+    if status is None:
+        raise HTTPException(status_code=404, detail=f'Commit ticket not found: {ticket_id}')
+
+    return status
+
 
 @app.get('/{repo_name}/_name/{prompt_name}', responses={200: {'content': {'application/x-yaml': {}}}})
-async def read_file_by_name(repo_name: str, prompt_name: str, raw: Optional[bool] = Query(None)):
+async def read_file_by_name(repo_name: str, prompt_name: str, raw: Optional[bool] = Query(None),
+                            ref: Optional[str] = Query(None), if_none_match: Optional[str] = Header(None)):
     repo_path = os.path.join(REPO_HOME, repo_name)
-    if not verify_dir_is_repo(repo_path):
+    if not await run_blocking(verify_dir_is_repo, repo_path):
         raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
 
+    if ref:
+        return await pinned_response(repo_path, ref, raw, if_none_match, name=prompt_name)
+
     file_path = os.path.join(repo_path, f'{prompt_name}.yml')
-    
+
     if os.path.exists(file_path):
-        data = parse_yaml(file_path)
-        
-        if raw:
-            return {'prompt': data.get('prompt')}
-        else:
-            return FileResponse(file_path, media_type='application/x-yaml')
-    
+        entry = await run_blocking(get_document, repo_path, file_path)
+        return prompt_response(entry, raw, if_none_match)
+
     else:
         raise HTTPException(status_code=404, detail=f'File not found: {file_path}')
 
 
 @app.get('/{repo_name}/_uuid/{prompt_uuid}', responses={200: {'content': {'application/x-yaml': {}}}})
-async def read_file_by_uuid(repo_name: str, prompt_uuid: UUID, raw: Optional[bool] = Query(None)):
+async def read_file_by_uuid(repo_name: str, prompt_uuid: UUID, raw: Optional[bool] = Query(None),
+                            ref: Optional[str] = Query(None), if_none_match: Optional[str] = Header(None)):
     repo_path = os.path.join(REPO_HOME, repo_name)
-    if not verify_dir_is_repo(repo_path):
+    if not await run_blocking(verify_dir_is_repo, repo_path):
         raise HTTPException(status_code=400, detail=f'directory is not a git repository: {repo_path}')
 
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith('.yml'):
-                file_location = os.path.join(root, file)
-                data = parse_yaml(file_location)
-                
-                if data.get('uuid') == str(prompt_uuid):
-                    if raw:
-                        return {'prompt': data.get('prompt')}
-                    else:
-                        return FileResponse(file_location, media_type='application/x-yaml')
-    
+    if ref:
+        return await pinned_response(repo_path, ref, raw, if_none_match, prompt_uuid=str(prompt_uuid))
+
+    entry = await run_blocking(find_by_uuid, repo_path, str(prompt_uuid))
+    if entry is not None:
+        return prompt_response(entry, raw, if_none_match)
+
     raise HTTPException(status_code=404, detail=f'File not found for UUID: {prompt_uuid}')
\ No newline at end of file
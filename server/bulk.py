@@ -0,0 +1,89 @@
+import os
+import tarfile
+import zipfile
+import tempfile
+
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def safe_relpath(name: str):
+    # reject absolute paths and anything that would land outside the repo or inside .git
+    norm = os.path.normpath(name.replace('\\', '/'))
+    parts = norm.split(os.sep)
+
+    if os.path.isabs(norm) or '..' in parts or '.git' in parts or norm == '.':
+        return None
+
+    return norm
+
+
+class LimitExceeded(Exception):
+    pass
+
+
+def read_limited(fileobj, name: str, max_size: int) -> bytes:
+    # never trust the size recorded in the archive header, stop reading once the limit is passed
+    content = fileobj.read(max_size + 1)
+    if len(content) > max_size:
+        raise LimitExceeded(f'{name} is larger than {max_size} bytes')
+    return content
+
+
+def iter_archive(archive_path: str, filename: str, max_member_size: int = None):
+    # yield (member name, content) for every regular file in a zip or tar archive, one member at a time
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as f:
+                        yield info.filename, read_limited(f, info.filename, max_member_size) if max_member_size else f.read()
+    else:
+        with tarfile.open(archive_path, 'r:*') as tf:
+            for member in tf:
+                if member.isfile():
+                    f = tf.extractfile(member)
+                    yield member.name, read_limited(f, member.name, max_member_size) if max_member_size else f.read()
+
+
+def limit_items(items, name: str, max_files: int = None, max_total_size: int = None):
+    # caps the number of files and the bytes extracted so far, checked as each file is read
+    count, total = 0, 0
+    for item_name, content in items:
+        count += 1
+        total += len(content)
+        if max_files and count > max_files:
+            raise LimitExceeded(f'{name} contains more than {max_files} files')
+        if max_total_size and total > max_total_size:
+            raise LimitExceeded(f'{name} expands to more than {max_total_size} bytes')
+        yield item_name, content
+
+
+def iter_uploads(files: list, max_size: int = None):
+    # multipart parts are already spooled to disk by the form parser, read them one by one
+    for file in files:
+        yield file.filename, read_limited(file.file, file.filename, max_size) if max_size else file.file.read()
+
+
+def copy_limited(src, dst, name: str, max_size: int, chunk_size: int = 64 * 1024):
+    size = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise LimitExceeded(f'{name} is larger than {max_size} bytes')
+        dst.write(chunk)
+
+
+def read_archive(fileobj, filename: str, max_size: int = None, max_member_size: int = None):
+    # spool the upload to disk and yield its members lazily, only one member is in memory at a time
+    with tempfile.NamedTemporaryFile() as tmp:
+        copy_limited(fileobj, tmp, filename, max_size)
+        tmp.flush()
+        yield from iter_archive(tmp.name, filename, max_member_size)
@@ -0,0 +1,121 @@
+import os
+import threading
+import yaml
+
+from collections import OrderedDict
+
+from metrics import stage
+from repofiles import git_blob_sha
+
+
+class CacheEntry:
+    def __init__(self, data, content: bytes, mtime: float):
+        self.data = data
+        self.content = content
+        self.mtime = mtime
+        self.blob_sha = git_blob_sha(content)
+
+
+class TemplateCache:
+    # bounded LRU of parsed prompt documents keyed by file path
+    def __init__(self, max_size: int = 1024, loader=yaml.safe_load):
+        self.max_size = max_size
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.heads = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _unchanged(self, file_path: str, entry: CacheEntry) -> bool:
+        # same mtime, or rewritten with the same content by a checkout
+        try:
+            mtime = os.stat(file_path).st_mtime
+            if mtime == entry.mtime:
+                return True
+            with open(file_path, 'rb') as f:
+                if git_blob_sha(f.read()) != entry.blob_sha:
+                    return False
+        except OSError:
+            return False
+
+        entry.mtime = mtime
+        return True
+
+    def check_head(self, repo_path: str, head):
+        # a new HEAD commit only drops the documents in that repo whose file changed
+        with self.lock:
+            if repo_path in self.heads and self.heads[repo_path] != head:
+                prefix = os.path.join(repo_path, '')
+                for file_path in [p for p in self.entries if p.startswith(prefix)]:
+                    if not self._unchanged(file_path, self.entries[file_path]):
+                        del self.entries[file_path]
+                        self.invalidations += 1
+            self.heads[repo_path] = head
+
+    def read(self, file_path: str) -> CacheEntry:
+        # read and parse a file without storing it
+        mtime = os.stat(file_path).st_mtime
+        with open(file_path, 'rb') as f:
+            content = f.read()
+
+        with stage('parse'):
+            data = self.loader(content)
+
+        return CacheEntry(data, content, mtime)
+
+    def load(self, file_path: str) -> CacheEntry:
+        # read and parse a file and store the result
+        entry = self.read(file_path)
+        self.put(file_path, entry)
+        return entry
+
+    def put(self, file_path: str, entry: CacheEntry):
+        with self.lock:
+            self.entries[file_path] = entry
+            self.entries.move_to_end(file_path)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_entry(self, file_path: str, mtime: float = None) -> CacheEntry:
+        # callers that just stat'ed the file pass its mtime
+        if mtime is None:
+            mtime = os.stat(file_path).st_mtime
+
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is not None:
+                if entry.mtime == mtime:
+                    self.entries.move_to_end(file_path)
+                    self.hits += 1
+                    return entry
+
+                del self.entries[file_path]
+                self.invalidations += 1
+
+            self.misses += 1
+
+        return self.load(file_path)
+
+    def get(self, file_path: str):
+        return self.get_entry(file_path).data
+
+    def invalidate(self, file_path: str):
+        with self.lock:
+            if self.entries.pop(file_path, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,193 @@
+import os
+import time
+import uuid
+import threading
+
+from collections import OrderedDict
+from git.exc import GitCommandError
+
+from metrics import stage
+
+
+def has_staged_changes(repo, files: list) -> bool:
+    # git diff --quiet exits with 1 when the index differs from HEAD
+    try:
+        repo.git.diff('--cached', '--quiet', '--', *files)
+    except GitCommandError as err:
+        if err.status == 1:
+            return True
+        raise
+    return False
+
+
+def commit_files(repos, repo_path: str, files: list, message: str = None) -> tuple:
+    # returns (commit sha, True), or (HEAD sha, False) without committing when the files match HEAD
+    if message is None:
+        message = 'Add file through API' if len(files) == 1 else f'Add {len(files)} files through API'
+
+    repo = repos.get(repo_path)
+    if repo is None:
+        raise RuntimeError(f'directory is not a git repository: {repo_path}')
+
+    with repos.git_lock(repo_path), stage('commit'):
+        try:
+            repo.git.add(files)
+            if repo.head.is_valid() and not has_staged_changes(repo, files):
+                return repo.head.commit.hexsha, False
+            commit = repo.index.commit(message)
+        except Exception:
+            # git add stages the other paths even when one is rejected,
+            # don't leave them staged for the next commit to pick up
+            try:
+                repo.git.reset('-q', '--', *files)
+            except Exception:
+                pass
+            raise
+
+    return commit.hexsha, True
+
+
+class CommitTicket:
+    def __init__(self, repo_path: str, files: list):
+        self.id = uuid.uuid4().hex
+        self.repo_path = repo_path
+        self.files = files
+        self.created = time.monotonic()
+        self.status = 'pending'
+        self.commit = None
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            'ticket': self.id,
+            'files': [os.path.relpath(f, self.repo_path) for f in self.files],
+            'status': self.status,
+            'commit': self.commit,
+            'error': self.error
+        }
+
+
+class CommitQueue:
+    # write-behind queue that groups uploads to the same repo into a single commit
+    def __init__(self, repos, window: float = 2.0, max_files: int = 100, history: int = 10000):
+        self.repos = repos
+        self.window = window
+        self.max_files = max_files
+        self.history = history
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()
+        self.tickets = OrderedDict()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='ps-commit-queue', daemon=True)
+        self.thread.start()
+
+    def submit(self, repo_path: str, files: list) -> CommitTicket:
+        ticket = CommitTicket(repo_path, list(files))
+
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('commit queue is closed')
+
+            self.pending.setdefault(repo_path, []).append(ticket)
+            self.tickets[ticket.id] = ticket
+            while len(self.tickets) > self.history:
+                self.tickets.popitem(last=False)
+            self.cond.notify()
+
+        return ticket
+
+    def status(self, repo_path: str, ticket_id: str):
+        with self.cond:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None or ticket.repo_path != repo_path:
+                return None
+            return ticket.to_dict()
+
+    def flush(self):
+        # commit everything pending right away
+        with self.cond:
+            for batch in self.pending.values():
+                for ticket in batch:
+                    ticket.created = float('-inf')
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+
+    def _batch_size(self, batch: list) -> int:
+        return sum(len(ticket.files) for ticket in batch)
+
+    def _take(self, repo_path: str) -> list:
+        # never hand out more than max_files per commit, the rest waits for the next round
+        batch = self.pending[repo_path]
+        taken, count = [], 0
+        while batch and (not taken or count + len(batch[0].files) <= self.max_files):
+            count += len(batch[0].files)
+            taken.append(batch.pop(0))
+
+        if not batch:
+            del self.pending[repo_path]
+        return taken
+
+    def _wait_for_batches(self):
+        with self.cond:
+            while True:
+                if not self.pending:
+                    if self.closed:
+                        return None
+                    self.cond.wait()
+                    continue
+
+                now = time.monotonic()
+                ready = [repo_path for repo_path, batch in self.pending.items()
+                         if self.closed
+                         or self._batch_size(batch) >= self.max_files
+                         or now - batch[0].created >= self.window]
+
+                if ready:
+                    return [(repo_path, self._take(repo_path)) for repo_path in ready]
+
+                due = min(batch[0].created for batch in self.pending.values()) + self.window
+                self.cond.wait(max(due - now, 0))
+
+    def _resolve(self, batch: list, status: str, sha: str = None, error: str = None):
+        with self.cond:
+            for ticket in batch:
+                ticket.status = status
+                ticket.commit = sha
+                ticket.error = error
+
+    def _commit(self, repo_path: str, batch: list):
+        # a file deleted since its upload would fail `git add` for the whole batch, leave it out
+        live = [ticket for ticket in batch if any(os.path.exists(f) for f in ticket.files)]
+        self._resolve([ticket for ticket in batch if ticket not in live], 'failed', error='file no longer exists')
+        if not live:
+            return
+
+        files = list(OrderedDict.fromkeys(f for ticket in live for f in ticket.files if os.path.exists(f)))
+
+        try:
+            sha, created = commit_files(self.repos, repo_path, files)
+        except Exception as err:
+            if len(live) == 1:
+                self._resolve(live, 'failed', error=str(err))
+                return
+
+            # retry one commit per ticket so a single bad upload doesn't fail the others
+            for ticket in live:
+                self._commit(repo_path, [ticket])
+            return
+
+        self._resolve(live, 'committed' if created else 'unchanged', sha)
+
+    def _run(self):
+        while True:
+            batches = self._wait_for_batches()
+            if batches is None:
+                return
+
+            for repo_path, batch in batches:
+                self._commit(repo_path, batch)
@@ -0,0 +1,247 @@
+import os
+import threading
+import yaml
+
+from collections import defaultdict
+from cache import TemplateCache, CacheEntry
+from search import TextIndex, FIELD_WEIGHTS
+from metrics import stage
+
+
+# schema fields with an inverted index, values of seq fields are indexed one by one
+FACETS = ('category', 'provider', 'model', 'tags', 'packs')
+
+# fields kept on every index entry for query results
+META_FIELDS = ('title',) + FACETS
+
+
+def extract_meta(data) -> dict:
+    if not isinstance(data, dict):
+        return {}
+    return {field: data[field] for field in META_FIELDS if data.get(field) is not None}
+
+
+def facet_values(meta: dict, field: str) -> list:
+    value = meta.get(field)
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def extract_text(data) -> dict:
+    if not isinstance(data, dict):
+        return {}
+    return {field: data[field] for field in FIELD_WEIGHTS if data.get(field) is not None}
+
+
+class IndexEntry:
+    def __init__(self, path: str, mtime: float, uuid, meta: dict = None):
+        self.path = path
+        self.mtime = mtime
+        self.uuid = uuid
+        self.meta = meta or {}
+
+
+class PromptIndex:
+    # uuid and facet indexes for a single prompt repository, parsed documents live in the bounded cache
+    def __init__(self, repo_path: str, cache: TemplateCache, snapshot: dict = None):
+        self.repo_path = repo_path
+        self.cache = cache
+        self.lock = threading.RLock()
+        # rescan the repo when a uuid is unknown, off when a watcher keeps the index current
+        self.refresh_on_miss = True
+        self._clear()
+
+        if snapshot is not None:
+            self.load_snapshot(snapshot)
+        else:
+            self.build()
+
+    def _walk(self):
+        for root, dirs, files in os.walk(self.repo_path):
+            # never descend into git metadata
+            if '.git' in dirs:
+                dirs.remove('.git')
+
+            for file in files:
+                if file.endswith('.yml'):
+                    yield os.path.join(root, file)
+
+    def _load(self, file_path: str):
+        # returns (entry, text fields) or (None, None) when the file can't be read
+        try:
+            doc = self.cache.load(file_path)
+        except (OSError, yaml.YAMLError):
+            return None, None
+
+        data = doc.data
+        f_uuid = data.get('uuid') if isinstance(data, dict) else None
+        return IndexEntry(file_path, doc.mtime, f_uuid, extract_meta(data)), extract_text(data)
+
+    def _clear(self):
+        self.entries = {}
+        self.by_uuid = {}
+        # field -> value -> set of paths
+        self.postings = {field: defaultdict(set) for field in FACETS}
+        self.text = TextIndex()
+
+    def _add(self, entry: IndexEntry, text: dict):
+        self._discard(entry.path)
+        self.entries[entry.path] = entry
+        if entry.uuid:
+            self.by_uuid[str(entry.uuid)] = entry.path
+        self.text.add(entry.path, text)
+
+        for field in FACETS:
+            for value in facet_values(entry.meta, field):
+                self.postings[field][value].add(entry.path)
+
+    def _discard(self, file_path: str):
+        old = self.entries.pop(file_path, None)
+        if old is None:
+            return
+
+        if old.uuid and self.by_uuid.get(str(old.uuid)) == file_path:
+            del self.by_uuid[str(old.uuid)]
+        self.text.remove(file_path)
+
+        for field in FACETS:
+            for value in facet_values(old.meta, field):
+                paths = self.postings[field].get(value)
+                if paths is not None:
+                    paths.discard(file_path)
+                    if not paths:
+                        del self.postings[field][value]
+
+    def build(self):
+        with self.lock, stage('scan'):
+            self._clear()
+            for file_path in self._walk():
+                entry, text = self._load(file_path)
+                if entry is not None:
+                    self._add(entry, text)
+
+    def load_snapshot(self, snapshot: dict):
+        # populate from a compiled index without parsing unchanged YAML; the snapshot only matches HEAD,
+        # so reconcile it with the working tree: new, edited and deleted files are picked up by refresh()
+        with self.lock:
+            self._clear()
+            for prompt in snapshot['prompts']:
+                file_path = os.path.join(self.repo_path, prompt['path'])
+                self._add(IndexEntry(file_path, prompt['mtime'], prompt.get('uuid'), extract_meta(prompt)), extract_text(prompt))
+            self.refresh()
+
+    def refresh(self):
+        # re-parse only files whose mtime changed and drop deleted files
+        with self.lock, stage('scan'):
+            seen = set()
+            for file_path in self._walk():
+                seen.add(file_path)
+                entry = self.entries.get(file_path)
+                try:
+                    mtime = os.stat(file_path).st_mtime
+                except OSError:
+                    continue
+
+                if entry is None or entry.mtime != mtime:
+                    self.update_file(file_path)
+
+            for file_path in list(self.entries):
+                if file_path not in seen:
+                    self._discard(file_path)
+
+    def update_file(self, file_path: str):
+        with self.lock:
+            entry, text = self._load(file_path)
+            if entry is None:
+                self._discard(file_path)
+            else:
+                self._add(entry, text)
+
+    def remove_file(self, file_path: str):
+        with self.lock:
+            self._discard(file_path)
+        self.cache.invalidate(file_path)
+
+    def _is_current(self, entry: IndexEntry) -> bool:
+        try:
+            return os.stat(entry.path).st_mtime == entry.mtime
+        except OSError:
+            return False
+
+    def query(self, filters: dict, offset: int = 0, limit: int = 50):
+        # intersect the posting lists of every requested value, returns (total, page of entries)
+        with self.lock:
+            sets = []
+            for field, values in filters.items():
+                for value in values:
+                    sets.append(self.postings[field].get(str(value), set()))
+
+            if sets:
+                sets.sort(key=len)
+                paths = set(sets[0])
+                for other in sets[1:]:
+                    paths &= other
+                    if not paths:
+                        break
+            else:
+                paths = set(self.entries)
+
+            ordered = sorted(paths)
+            page = [self.entries[path] for path in ordered[offset:offset + limit]]
+
+        return len(ordered), page
+
+    def search(self, query: str, offset: int = 0, limit: int = 20):
+        # ranked full-text search, returns (total, [(entry, score)])
+        with self.lock:
+            total, hits = self.text.search(query, offset, limit)
+            return total, [(self.entries[path], score) for path, score in hits]
+
+    def facets(self) -> dict:
+        # value counts per facet field
+        with self.lock:
+            return {field: {value: len(paths) for value, paths in values.items()}
+                    for field, values in self.postings.items()}
+
+    def document(self, entry: IndexEntry) -> CacheEntry:
+        # the entry's mtime was just checked, a cached document with the same mtime is current
+        return self.cache.get_entry(entry.path, entry.mtime)
+
+    def get_by_name(self, name: str):
+        # names are paths relative to the repo without the .yml suffix
+        return self.get_by_path(os.path.join(self.repo_path, f'{name}.yml'))
+
+    def get_by_path(self, file_path: str):
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is not None and self._is_current(entry):
+                return entry
+
+            if os.path.isfile(file_path):
+                self.update_file(file_path)
+            else:
+                self._discard(file_path)
+
+            return self.entries.get(file_path)
+
+    def get_by_uuid(self, prompt_uuid: str):
+        prompt_uuid = str(prompt_uuid)
+
+        with self.lock:
+            file_path = self.by_uuid.get(prompt_uuid)
+            entry = self.entries.get(file_path) if file_path else None
+
+            if entry is not None and self._is_current(entry):
+                return entry
+
+            # stale or unknown uuid, the file may have been edited, moved or added
+            if entry is not None:
+                self.update_file(entry.path)
+            if entry is not None or self.refresh_on_miss:
+                self.refresh()
+
+            file_path = self.by_uuid.get(prompt_uuid)
+            return self.entries.get(file_path) if file_path else None
@@ -0,0 +1,92 @@
+import threading
+
+from string import Formatter
+from collections import OrderedDict
+
+
+class RenderError(Exception):
+    pass
+
+
+class CompiledTemplate:
+    # a prompt split once into literal text and {variable} fields, rendering is a join
+    def __init__(self, template: str, input_variables: list = None):
+        try:
+            self.segments = list(Formatter().parse(template))
+        except ValueError as err:
+            raise RenderError(f'prompt is not a valid template: {err}')
+
+        self.variables = list(OrderedDict.fromkeys(
+            field for _, field, _, _ in self.segments if field is not None))
+
+        for field in self.variables:
+            if not field.isidentifier():
+                raise RenderError(f'unsupported template field: {{{field}}}')
+
+        self.declared = list(input_variables) if input_variables else list(self.variables)
+
+        undeclared = [field for field in self.variables if field not in self.declared]
+        if undeclared:
+            raise RenderError(f'template uses variables missing from input_variables: {", ".join(undeclared)}')
+
+    def render(self, values: dict) -> str:
+        missing = [name for name in self.declared if name not in values]
+        if missing:
+            raise RenderError(f'missing input variables: {", ".join(missing)}')
+
+        unknown = [name for name in values if name not in self.declared]
+        if unknown:
+            raise RenderError(f'unknown input variables: {", ".join(unknown)}')
+
+        parts = []
+        for literal, field, spec, conversion in self.segments:
+            parts.append(literal)
+            if field is None:
+                continue
+
+            value = values[field]
+            if conversion == 'r':
+                value = repr(value)
+            elif conversion == 'a':
+                value = ascii(value)
+            elif conversion == 's':
+                value = str(value)
+
+            try:
+                parts.append(format(value, spec or ''))
+            except (TypeError, ValueError) as err:
+                raise RenderError(f'cannot format {{{field}}} with spec {spec!r}: {err}')
+
+        return ''.join(parts)
+
+
+class TemplateCompiler:
+    # compiled templates keyed by git blob sha, a blob never changes so entries never go stale
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.templates = OrderedDict()
+
+    def get(self, entry) -> CompiledTemplate:
+        with self.lock:
+            template = self.templates.get(entry.blob_sha)
+            if template is not None:
+                self.templates.move_to_end(entry.blob_sha)
+                return template
+
+        data = entry.data if isinstance(entry.data, dict) else {}
+        if not isinstance(data.get('prompt'), str):
+            raise RenderError('prompt field is missing')
+
+        template = CompiledTemplate(data['prompt'], data.get('input_variables'))
+
+        with self.lock:
+            self.templates[entry.blob_sha] = template
+            while len(self.templates) > self.max_size:
+                self.templates.popitem(last=False)
+
+        return template
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'size': len(self.templates), 'max_size': self.max_size}
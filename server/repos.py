@@ -0,0 +1,96 @@
+import os
+import threading
+
+from collections import defaultdict
+
+from git import Repo
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+from metrics import stage
+
+
+def read_head(git_dir: str):
+    # HEAD commit straight from the ref files, no git subprocess or Repo object
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            head = f.read().strip()
+        if not head.startswith('ref: '):
+            return head
+
+        ref = head[len('ref: '):]
+        ref_path = os.path.join(git_dir, ref)
+        if os.path.exists(ref_path):
+            with open(ref_path, 'r') as f:
+                return f.read().strip()
+
+        with open(os.path.join(git_dir, 'packed-refs'), 'r') as f:
+            for line in f:
+                if line.rstrip().endswith(' ' + ref):
+                    return line.split(' ', 1)[0]
+    except OSError:
+        pass
+
+    return None
+
+
+class RepoRegistry:
+    # opens each repository under the repo home once and reuses it across requests
+    def __init__(self, repo_home: str):
+        self.repo_home = repo_home
+        self.lock = threading.Lock()
+        self.repos = {}
+        self.git_locks = defaultdict(threading.Lock)
+
+    def _open(self, repo_path: str):
+        try:
+            with stage('repo_open'):
+                return Repo(repo_path)
+        except (InvalidGitRepositoryError, NoSuchPathError):
+            return None
+
+    def get(self, repo_path: str):
+        repo = self.repos.get(repo_path)
+
+        # the repository was removed since it was opened
+        if repo is not None and not os.path.isdir(repo.git_dir):
+            with self.lock:
+                self.repos.pop(repo_path, None)
+            repo.close()
+            repo = None
+
+        # new repository, or a path we have not seen yet
+        if repo is None:
+            repo = self._open(repo_path)
+            if repo is not None:
+                with self.lock:
+                    repo = self.repos.setdefault(repo_path, repo)
+
+        return repo
+
+    def scan(self) -> list:
+        # open every repository under the repo home and forget removed ones
+        if not self.repo_home or not os.path.isdir(self.repo_home):
+            return []
+
+        for repo_path in list(self.repos):
+            self.get(repo_path)
+
+        found = []
+        for name in sorted(os.listdir(self.repo_home)):
+            repo_path = os.path.join(self.repo_home, name)
+            if os.path.isdir(repo_path) and self.get(repo_path) is not None:
+                found.append(repo_path)
+
+        return found
+
+    def git_lock(self, repo_path: str) -> threading.Lock:
+        # Repo objects are shared between worker threads, commits and object reads must be serialized
+        with self.lock:
+            return self.git_locks[repo_path]
+
+    def head(self, repo_path: str):
+        # resolving HEAD through the shared Repo would talk to its cat-file process without git_lock
+        repo = self.get(repo_path)
+        if repo is None:
+            return None
+        return read_head(repo.git_dir)
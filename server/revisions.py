@@ -0,0 +1,104 @@
+import threading
+
+from collections import OrderedDict
+from gitdb.exc import BadName, BadObject
+
+from cache import CacheEntry
+
+
+class RevisionStore:
+    # prompts read straight from git objects at a pinned revision, nothing is checked out
+    def __init__(self, repos, loader, max_blobs: int = 4096, max_commits: int = 64):
+        self.repos = repos
+        self.loader = loader
+        self.max_blobs = max_blobs
+        self.max_commits = max_commits
+        self.lock = threading.Lock()
+        # blobs are immutable so their sha is a permanent cache key
+        self.blobs = OrderedDict()
+        # commit sha -> {uuid: path} for uuid lookups at a revision
+        self.uuid_maps = OrderedDict()
+
+    def _remember(self, store: OrderedDict, key: str, value, max_size: int):
+        with self.lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > max_size:
+                store.popitem(last=False)
+
+    def _recall(self, store: OrderedDict, key: str):
+        with self.lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def resolve(self, repo_path: str, ref: str):
+        repo = self.repos.get(repo_path)
+        if repo is None:
+            return None
+
+        try:
+            with self.repos.git_lock(repo_path):
+                commit = repo.commit(ref)
+                # a full sha isn't looked up until the object is read
+                commit.tree
+                return commit
+        except (BadName, BadObject, ValueError, LookupError):
+            # reflog refs such as @{-1} or HEAD@{1000} that don't exist raise IndexError
+            return None
+
+    def _load_blob(self, repo_path: str, blob) -> CacheEntry:
+        entry = self._recall(self.blobs, blob.hexsha)
+        if entry is None:
+            with self.repos.git_lock(repo_path):
+                content = blob.data_stream.read()
+            entry = CacheEntry(self.loader(content), content, None)
+            self._remember(self.blobs, blob.hexsha, entry, self.max_blobs)
+        return entry
+
+    def get_by_path(self, repo_path: str, commit, rel_path: str):
+        try:
+            with self.repos.git_lock(repo_path):
+                blob = commit.tree / rel_path
+        except KeyError:
+            return None
+
+        if blob.type != 'blob':
+            return None
+        return self._load_blob(repo_path, blob)
+
+    def get_by_name(self, repo_path: str, commit, name: str):
+        return self.get_by_path(repo_path, commit, f'{name}.yml')
+
+    def _uuid_map(self, repo_path: str, commit) -> dict:
+        uuid_map = self._recall(self.uuid_maps, commit.hexsha)
+        if uuid_map is not None:
+            return uuid_map
+
+        with self.repos.git_lock(repo_path):
+            blobs = [item for item in commit.tree.traverse()
+                     if item.type == 'blob' and item.path.endswith('.yml')]
+
+        uuid_map = {}
+        for blob in blobs:
+            try:
+                data = self._load_blob(repo_path, blob).data
+            except Exception:
+                continue
+
+            if isinstance(data, dict) and data.get('uuid'):
+                uuid_map.setdefault(str(data['uuid']), blob.path)
+
+        self._remember(self.uuid_maps, commit.hexsha, uuid_map, self.max_commits)
+        return uuid_map
+
+    def get_by_uuid(self, repo_path: str, commit, prompt_uuid: str):
+        rel_path = self._uuid_map(repo_path, commit).get(str(prompt_uuid))
+        if rel_path is None:
+            return None
+        return self.get_by_path(repo_path, commit, rel_path)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'blobs': len(self.blobs), 'commits': len(self.uuid_maps)}
@@ -0,0 +1,27 @@
+import yaml
+
+from pykwalify.core import Core
+from pykwalify.errors import PyKwalifyException
+
+from metrics import stage
+
+
+class SchemaValidator:
+    # schema.yml is read once, every validation reuses the parsed schema
+    def __init__(self, schema_path: str, loader=yaml.safe_load):
+        self.schema_path = schema_path
+        with open(schema_path, 'r') as f:
+            self.schema = loader(f)
+
+    def validate(self, data) -> list:
+        if not isinstance(data, dict):
+            return ['prompt must be a YAML mapping']
+
+        with stage('validate'):
+            c = Core(source_data=data, schema_data=self.schema)
+            try:
+                c.validate(raise_exception=True)
+            except PyKwalifyException as err:
+                return list(c.validation_errors) or [str(err)]
+
+        return []
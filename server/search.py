@@ -0,0 +1,91 @@
+import re
+import math
+
+from collections import defaultdict
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# matches in the title count more than matches in the description or prompt body
+FIELD_WEIGHTS = {'title': 3.0, 'description': 2.0, 'prompt': 1.0}
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class TextIndex:
+    # BM25 ranked full-text index, not thread safe on its own, the owning PromptIndex holds the lock
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc: weighted term frequency}
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0.0
+
+    def add(self, doc: str, fields: dict):
+        self.remove(doc)
+
+        freqs = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                freqs[token] += weight
+
+        if not freqs:
+            return
+
+        length = sum(freqs.values())
+        for term, freq in freqs.items():
+            self.postings[term][doc] = freq
+
+        self.doc_terms[doc] = list(freqs)
+        self.doc_lengths[doc] = length
+        self.total_length += length
+
+    def remove(self, doc: str):
+        terms = self.doc_terms.pop(doc, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc, None)
+                if not docs:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(doc)
+
+    def search(self, query: str, offset: int = 0, limit: int = 20):
+        # every query term must match, results are ranked by BM25 score, returns (total, [(doc, score)])
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return 0, []
+
+        lists = [self.postings.get(term, {}) for term in terms]
+        if any(not docs for docs in lists):
+            return 0, []
+
+        candidates = set(min(lists, key=len))
+        for docs in lists:
+            candidates.intersection_update(docs)
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores = []
+
+        for doc in candidates:
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / avg_length)
+            score = 0.0
+            for docs in lists:
+                freq = docs[doc]
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                score += idf * freq * (self.k1 + 1) / (freq + norm)
+            scores.append((doc, score))
+
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return len(scores), scores[offset:offset + limit]
@@ -0,0 +1,284 @@
+import os
+import time
+import threading
+
+from repos import read_head
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+ADDED = 'added'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+# changes may have been missed, the whole repo has to be compared with the index
+RESCAN = 'rescan'
+
+
+def is_prompt(name: str) -> bool:
+    return name.endswith('.yml')
+
+
+class PollingBackend:
+    # stats directories every interval and only lists the ones whose mtime moved;
+    # a full stat of every prompt runs when HEAD changes and every full_scan_interval
+    def __init__(self, emit, interval: float = 2.0, full_scan_interval: float = 60.0):
+        self.emit = emit
+        self.interval = interval
+        self.full_scan_interval = full_scan_interval
+        self.repos = {}
+
+    def _scan_dir(self, dir_path: str) -> dict:
+        files = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for item in it:
+                    if item.is_file(follow_symlinks=False) and is_prompt(item.name):
+                        files[item.path] = item.stat().st_mtime
+        except OSError:
+            pass
+        return files
+
+    def _walk_dirs(self, repo_path: str) -> dict:
+        dirs = {}
+        for root, subdirs, _ in os.walk(repo_path):
+            subdirs[:] = [d for d in subdirs if d != '.git']
+            try:
+                dirs[root] = os.stat(root).st_mtime
+            except OSError:
+                pass
+        return dirs
+
+    def _full_state(self, repo_path: str):
+        dirs = self._walk_dirs(repo_path)
+        files = {}
+        for dir_path in dirs:
+            files.update(self._scan_dir(dir_path))
+        return dirs, files
+
+    def add(self, repo_path: str):
+        dirs, files = self._full_state(repo_path)
+        self.repos[repo_path] = {
+            'head': read_head(os.path.join(repo_path, '.git')),
+            'dirs': dirs,
+            'files': files,
+            'full_scan': time.monotonic()
+        }
+
+    def _diff(self, repo_path: str, old: dict, new: dict):
+        for file_path, mtime in new.items():
+            if file_path not in old:
+                self.emit(repo_path, ADDED, file_path)
+            elif old[file_path] != mtime:
+                self.emit(repo_path, MODIFIED, file_path)
+        for file_path in old:
+            if file_path not in new:
+                self.emit(repo_path, DELETED, file_path)
+
+    def poll(self):
+        now = time.monotonic()
+
+        for repo_path, state in list(self.repos.items()):
+            head = read_head(os.path.join(repo_path, '.git'))
+
+            if head != state['head'] or now - state['full_scan'] >= self.full_scan_interval:
+                dirs, files = self._full_state(repo_path)
+                self._diff(repo_path, state['files'], files)
+                state.update(head=head, dirs=dirs, files=files, full_scan=now)
+                continue
+
+            # only directories whose entries changed are listed again
+            dirs = self._walk_dirs(repo_path)
+            changed = [d for d, mtime in dirs.items() if state['dirs'].get(d) != mtime]
+            removed = [d for d in state['dirs'] if d not in dirs]
+
+            for dir_path in changed + removed:
+                old = {p: m for p, m in state['files'].items() if os.path.dirname(p) == dir_path}
+                new = self._scan_dir(dir_path) if dir_path in dirs else {}
+                self._diff(repo_path, old, new)
+                for file_path in old:
+                    state['files'].pop(file_path, None)
+                state['files'].update(new)
+
+            state['dirs'] = dirs
+
+    def read(self, stopped: threading.Event):
+        stopped.wait(self.interval)
+        return None
+
+    def process(self, events):
+        self.poll()
+
+    def close(self):
+        pass
+
+
+class InotifyBackend:
+    # kernel change notifications for every directory in each repo
+    def __init__(self, emit, interval: float = 2.0, full_scan_interval: float = 60.0):
+        self.emit = emit
+        self.inotify = INotify()
+        self.watches = {}
+        self.known = set()
+        self.mask = (flags.CREATE | flags.DELETE | flags.CLOSE_WRITE | flags.MOVED_FROM |
+                     flags.MOVED_TO | flags.DELETE_SELF)
+        # repos that can't be watched completely, e.g. out of inotify watches, are polled instead
+        self.fallback = PollingBackend(emit, interval, full_scan_interval)
+        self.next_poll = 0.0
+
+    def _watch_tree(self, repo_path: str, top: str, emit_added: bool = False) -> bool:
+        # False when a directory couldn't be watched and the repo moved to polling
+        for root, subdirs, files in os.walk(top):
+            subdirs[:] = [d for d in subdirs if d != '.git']
+            try:
+                wd = self.inotify.add_watch(root, self.mask)
+            except OSError as err:
+                print(f'cannot watch {root}, polling {repo_path} instead: {err}', 'error')
+                self._poll_instead(repo_path)
+                return False
+            self.watches[wd] = (repo_path, root)
+
+            for file in files:
+                if is_prompt(file):
+                    file_path = os.path.join(root, file)
+                    if emit_added and file_path not in self.known:
+                        self.emit(repo_path, ADDED, file_path)
+                    self.known.add(file_path)
+        return True
+
+    def _forget(self, repo_path: str):
+        prefix = os.path.join(repo_path, '')
+        self.known = {p for p in self.known if not p.startswith(prefix)}
+
+    def _poll_instead(self, repo_path: str):
+        for wd, (watched, _) in list(self.watches.items()):
+            if watched == repo_path:
+                del self.watches[wd]
+                try:
+                    self.inotify.rm_watch(wd)
+                except OSError:
+                    pass
+        self._forget(repo_path)
+        self.fallback.add(repo_path)
+
+    def _resync(self, repo_path: str):
+        # watch directories created while events were lost and compare the repo with the index
+        self._forget(repo_path)
+        self._watch_tree(repo_path, repo_path)
+        self.emit(repo_path, RESCAN, repo_path)
+
+    def add(self, repo_path: str):
+        self._watch_tree(repo_path, repo_path)
+
+    def _handle(self, event):
+        if event.mask & flags.Q_OVERFLOW:
+            # the kernel queue overflowed and dropped events for every watched repo
+            for repo_path in {repo for repo, _ in self.watches.values()}:
+                self._resync(repo_path)
+            return
+
+        watch = self.watches.get(event.wd)
+        if watch is None:
+            return
+
+        repo_path, dir_path = watch
+        if event.mask & flags.DELETE_SELF:
+            self.watches.pop(event.wd, None)
+            return
+
+        path = os.path.join(dir_path, event.name)
+
+        if event.mask & flags.ISDIR:
+            # new or moved-in directory, watch it and report the prompts already inside
+            if event.mask & (flags.CREATE | flags.MOVED_TO) and os.path.basename(path) != '.git':
+                if not self._watch_tree(repo_path, path, emit_added=True):
+                    self.emit(repo_path, RESCAN, repo_path)
+            elif event.mask & flags.MOVED_FROM:
+                prefix = os.path.join(path, '')
+                for file_path in [p for p in self.known if p.startswith(prefix)]:
+                    self.known.discard(file_path)
+                    self.emit(repo_path, DELETED, file_path)
+            return
+
+        if not is_prompt(event.name):
+            return
+
+        if event.mask & (flags.DELETE | flags.MOVED_FROM):
+            self.known.discard(path)
+            self.emit(repo_path, DELETED, path)
+        elif event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO):
+            kind = MODIFIED if path in self.known else ADDED
+            self.known.add(path)
+            self.emit(repo_path, kind, path)
+
+    def read(self, stopped: threading.Event):
+        # wake up regularly so stop() doesn't hang on a quiet repo
+        return self.inotify.read(timeout=500)
+
+    def process(self, events):
+        for event in events:
+            self._handle(event)
+
+        if self.fallback.repos and time.monotonic() >= self.next_poll:
+            self.fallback.poll()
+            self.next_poll = time.monotonic() + self.fallback.interval
+
+    def close(self):
+        self.inotify.close()
+
+
+class RepoWatcher:
+    # background thread that reports added, modified and deleted prompt files to subscribers
+    def __init__(self, mode: str = 'auto', interval: float = 2.0, full_scan_interval: float = 60.0):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+        if mode == 'inotify' or (mode == 'auto' and INotify is not None):
+            if INotify is None:
+                raise RuntimeError('inotify_simple is not installed')
+            self.backend = InotifyBackend(self._emit, interval, full_scan_interval)
+            self.mode = 'inotify'
+        else:
+            self.backend = PollingBackend(self._emit, interval, full_scan_interval)
+            self.mode = 'poll'
+
+    def subscribe(self, callback):
+        # callback(repo_path, kind, file_path)
+        self.subscribers.append(callback)
+
+    def _emit(self, repo_path: str, kind: str, file_path: str):
+        for callback in self.subscribers:
+            try:
+                callback(repo_path, kind, file_path)
+            except Exception as err:
+                print(f'watcher callback failed for {file_path}: {err}', 'error')
+
+    def watch(self, repo_path: str):
+        # repos can be added while the watcher thread is running
+        with self.lock:
+            self.backend.add(repo_path)
+
+        # anything changed between building the index and the first watch would go unreported
+        self._emit(repo_path, RESCAN, repo_path)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            events = self.backend.read(self.stopped)
+            if self.stopped.is_set():
+                return
+            with self.lock:
+                self.backend.process(events)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='ps-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.backend.close()
@@ -0,0 +1,40 @@
+import os
+import sys
+import pytest
+
+from git import Repo
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# the server and tools are run as scripts from their own directories
+sys.path.append(os.path.join(ROOT_DIR, 'server'))
+sys.path.append(os.path.join(ROOT_DIR, 'tools'))
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    # api.py reads its config at import time and only runs one app lifecycle per process
+    home = tmp_path_factory.mktemp('home')
+    repo = Repo.init(str(home / 'prompts'))
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@localhost')
+
+    config_path = str(home / 'ps.conf')
+    with open(config_path, 'w') as f:
+        f.write(f'[main]\nrepo_path = {home}\n\n[server]\n'
+                f'schema_path = {os.path.join(ROOT_DIR, "schema.yml")}\n'
+                'watch = off\n'
+                'index_snapshots = false\n'
+                'commit_window = 0.05\n'
+                'max_upload_size = 4096\n'
+                'max_archive_size = 65536\n'
+                'max_bulk_files = 5\n'
+                'max_bulk_size = 16384\n')
+    os.environ['PS_CONFIG'] = config_path
+
+    import api
+    from fastapi.testclient import TestClient
+
+    with TestClient(api.app) as client:
+        yield api, client, str(home / 'prompts')
@@ -0,0 +1,49 @@
+import os
+import threading
+
+from git import Repo
+
+
+def test_building_a_new_index_does_not_block_other_repos(server, monkeypatch):
+    api, _, repo_path = server
+    slow_path = os.path.join(os.path.dirname(repo_path), 'slow')
+    Repo.init(slow_path)
+    release = threading.Event()
+    building = threading.Event()
+    PromptIndex = api.PromptIndex
+
+    def slow_index(path, *args):
+        if path == slow_path:
+            building.set()
+            release.wait(10)
+        return PromptIndex(path, *args)
+
+    monkeypatch.setattr(api, 'PromptIndex', slow_index)
+    api.get_index(repo_path)
+    thread = threading.Thread(target=api.get_index, args=(slow_path,))
+    thread.start()
+    try:
+        assert building.wait(10)
+        done = threading.Event()
+        threading.Thread(target=lambda: (api.get_index(repo_path), done.set())).start()
+        assert done.wait(2)
+    finally:
+        release.set()
+        thread.join()
+
+    assert api.get_index(slow_path) is api.indexes[slow_path]
+
+
+def test_metrics_do_not_wait_for_the_index_lock(server):
+    api, client, repo_path = server
+    api.get_index(repo_path)
+
+    responses = []
+    with api.indexes_lock:
+        thread = threading.Thread(target=lambda: responses.append(client.get('/_metrics')), daemon=True)
+        thread.start()
+        thread.join(5)
+        assert responses, '/_metrics waited for indexes_lock'
+
+    assert responses[0].status_code == 200
+    assert 'prompt_serve_indexed_prompts{repo="prompts"}' in responses[0].text
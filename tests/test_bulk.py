@@ -0,0 +1,64 @@
+import io
+import zipfile
+import tarfile
+import pytest
+
+from bulk import safe_relpath, read_limited, limit_items, read_archive, LimitExceeded
+
+
+@pytest.mark.parametrize('name', ['../x.yml', 'a/../../x.yml', '/etc/x.yml', '.git/config', 'a/.git/x.yml',
+                                  '..\\x.yml', '.', ''])
+def test_safe_relpath_rejects_paths_outside_the_repo(name):
+    assert safe_relpath(name) is None
+
+
+@pytest.mark.parametrize('name, expected', [('a.yml', 'a.yml'), ('cot/./a.yml', 'cot/a.yml'),
+                                            ('cot/x/../a.yml', 'cot/a.yml'), ('cot\\a.yml', 'cot/a.yml')])
+def test_safe_relpath_normalizes_names_inside_the_repo(name, expected):
+    assert safe_relpath(name) == expected
+
+
+def test_read_limited_stops_after_the_limit():
+    assert read_limited(io.BytesIO(b'x' * 10), 'a.yml', 10) == b'x' * 10
+    with pytest.raises(LimitExceeded):
+        read_limited(io.BytesIO(b'x' * 11), 'a.yml', 10)
+
+
+def test_limit_items_caps_file_count_and_total_size():
+    items = [(f'{i}.yml', b'x' * 10) for i in range(3)]
+    assert list(limit_items(iter(items), 'upload', max_files=3, max_total_size=30)) == items
+
+    with pytest.raises(LimitExceeded, match='more than 2 files'):
+        list(limit_items(iter(items), 'upload', max_files=2))
+    with pytest.raises(LimitExceeded, match='more than 25 bytes'):
+        list(limit_items(iter(items), 'upload', max_total_size=25))
+
+
+def make_zip(members: dict) -> io.BytesIO:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    buf.seek(0)
+    return buf
+
+
+def test_read_archive_yields_members_of_zip_and_tar():
+    assert list(read_archive(make_zip({'a.yml': b'a', 'b/c.yml': b'c'}), 'p.zip')) == [('a.yml', b'a'), ('b/c.yml', b'c')]
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tf:
+        info = tarfile.TarInfo('a.yml')
+        info.size = 1
+        tf.addfile(info, io.BytesIO(b'a'))
+    buf.seek(0)
+    assert list(read_archive(buf, 'p.tar.gz')) == [('a.yml', b'a')]
+
+
+def test_read_archive_limits_the_archive_and_each_member():
+    bomb = make_zip({'a.yml': b'\0' * 100000})
+    with pytest.raises(LimitExceeded, match='a.yml is larger than 1000 bytes'):
+        list(read_archive(bomb, 'p.zip', max_size=10000, max_member_size=1000))
+
+    with pytest.raises(LimitExceeded, match='p.zip is larger than 10 bytes'):
+        list(read_archive(make_zip({'a.yml': b'a'}), 'p.zip', max_size=10))
@@ -0,0 +1,94 @@
+import os
+import time
+
+from git import Repo
+
+from commits import CommitQueue
+from repos import RepoRegistry
+
+
+def make_repo(tmp_path):
+    repo_path = str(tmp_path / 'prompts')
+    repo = Repo.init(repo_path)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@localhost')
+    return repo_path, RepoRegistry(str(tmp_path))
+
+
+def write(repo_path, name):
+    file_path = os.path.join(repo_path, name)
+    with open(file_path, 'w') as f:
+        f.write(f'title: {name}\n')
+    return file_path
+
+
+def committed_files(repo_path):
+    return set(Repo(repo_path).git.ls_files().splitlines())
+
+
+def test_uploads_in_one_window_share_a_commit(tmp_path):
+    repo_path, repos = make_repo(tmp_path)
+    queue = CommitQueue(repos, window=60)
+    tickets = [queue.submit(repo_path, [write(repo_path, f'{i}.yml')]) for i in range(3)]
+    queue.close()
+
+    assert {t.status for t in tickets} == {'committed'}
+    assert len({t.commit for t in tickets}) == 1
+    assert committed_files(repo_path) == {'0.yml', '1.yml', '2.yml'}
+
+
+def test_batches_are_split_at_max_files(tmp_path):
+    repo_path, repos = make_repo(tmp_path)
+    queue = CommitQueue(repos, window=60, max_files=2)
+    tickets = [queue.submit(repo_path, [write(repo_path, f'{i}.yml')]) for i in range(3)]
+    queue.close()
+
+    assert {t.status for t in tickets} == {'committed'}
+    assert tickets[0].commit == tickets[1].commit != tickets[2].commit
+
+
+def test_deleted_file_does_not_fail_the_batch(tmp_path):
+    repo_path, repos = make_repo(tmp_path)
+    queue = CommitQueue(repos, window=60)
+    kept = queue.submit(repo_path, [write(repo_path, 'kept.yml')])
+    gone = queue.submit(repo_path, [write(repo_path, 'gone.yml')])
+    os.remove(os.path.join(repo_path, 'gone.yml'))
+    queue.close()
+
+    assert kept.status == 'committed'
+    assert gone.status == 'failed'
+    assert committed_files(repo_path) == {'kept.yml'}
+
+
+def test_failed_batch_is_retried_per_ticket(tmp_path):
+    repo_path, repos = make_repo(tmp_path)
+    with open(os.path.join(repo_path, '.gitignore'), 'w') as f:
+        f.write('ignored.yml\n')
+
+    queue = CommitQueue(repos, window=60)
+    first = queue.submit(repo_path, [write(repo_path, 'first.yml')])
+    ignored = queue.submit(repo_path, [write(repo_path, 'ignored.yml')])
+    last = queue.submit(repo_path, [write(repo_path, 'last.yml')])
+    queue.close()
+
+    assert first.status == last.status == 'committed'
+    assert ignored.status == 'failed' and ignored.error
+    assert committed_files(repo_path) == {'first.yml', 'last.yml'}
+
+
+def test_unchanged_upload_makes_no_commit(tmp_path):
+    repo_path, repos = make_repo(tmp_path)
+    queue = CommitQueue(repos, window=60)
+    first = queue.submit(repo_path, [write(repo_path, 'a.yml')])
+    queue.flush()
+    while first.status == 'pending':
+        time.sleep(0.01)
+
+    again = queue.submit(repo_path, [write(repo_path, 'a.yml')])
+    queue.close()
+
+    assert first.status == 'committed'
+    assert again.status == 'unchanged'
+    assert again.commit == first.commit == Repo(repo_path).head.commit.hexsha
+    assert len(list(Repo(repo_path).iter_commits())) == 1
@@ -0,0 +1,19 @@
+import json
+import datetime
+
+from corpus import Record, StatsCollector
+
+
+def test_stats_to_dict_is_json_for_non_string_values():
+    stats = StatsCollector()
+    stats.consume(Record('a.yml', {'category': datetime.date(2023, 1, 1), 'provider': 'openai', 'model': 4,
+                                   'tags': ['x', 'y']}))
+    stats.consume(Record('b.yml', {'category': 'qa', 'provider': 'openai', 'model': 'gpt-4', 'tags': 'x'}))
+    stats.consume(Record('c.yml', None))
+
+    result = json.loads(json.dumps(stats.to_dict()))
+
+    assert result['prompts'] == 2
+    assert result['distributions']['category'] == {'2023-01-01': 1, 'qa': 1}
+    assert result['distributions']['tags'] == {'x': 1, 'y': 1}
+    assert result['model_by_category'] == {'4': {'2023-01-01': 1}, 'gpt-4': {'qa': 1}}
@@ -0,0 +1,116 @@
+import os
+import yaml
+
+from cache import TemplateCache
+from index import PromptIndex
+
+
+def write_prompt(repo_path, name, prompt_uuid, category='qa', mtime=None):
+    file_path = os.path.join(repo_path, f'{name}.yml')
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        yaml.safe_dump({'title': name, 'uuid': prompt_uuid, 'category': category, 'prompt': f'{name} {{query}}'}, f)
+    if mtime is not None:
+        os.utime(file_path, (mtime, mtime))
+    return file_path
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, content):
+        self.calls += 1
+        return yaml.safe_load(content)
+
+
+def make_index(repo_path, cache_size=1024):
+    loader = CountingLoader()
+    return PromptIndex(str(repo_path), TemplateCache(cache_size, loader=loader)), loader
+
+
+def test_reads_of_unchanged_files_hit_the_cache(tmp_path):
+    write_prompt(tmp_path, 'a', 'uuid-a')
+    index, loader = make_index(tmp_path)
+    assert loader.calls == 1
+
+    for _ in range(3):
+        entry = index.get_by_uuid('uuid-a')
+        assert index.document(entry).data['prompt'] == 'a {query}'
+        assert index.document(index.get_by_name('a')).data['title'] == 'a'
+    assert loader.calls == 1
+    assert index.cache.stats()['hits'] == 6
+
+
+def test_documents_are_bounded_by_the_cache_size(tmp_path):
+    for name in 'abc':
+        write_prompt(tmp_path, name, f'uuid-{name}')
+    index, loader = make_index(tmp_path, cache_size=2)
+
+    for name in 'abc':
+        assert index.document(index.get_by_name(name)).data['title'] == name
+
+    stats = index.cache.stats()
+    assert stats['size'] == 2
+    assert stats['evictions'] >= 1 and stats['misses'] >= 1
+    assert loader.calls == 3 + stats['misses']
+
+
+def test_refresh_picks_up_added_edited_and_deleted_files(tmp_path):
+    write_prompt(tmp_path, 'a', 'uuid-a', mtime=1000)
+    removed = write_prompt(tmp_path, 'b', 'uuid-b', mtime=1000)
+    index, loader = make_index(tmp_path)
+
+    write_prompt(tmp_path, 'a', 'uuid-a', category='cot', mtime=2000)
+    write_prompt(tmp_path, 'sub/c', 'uuid-c', mtime=1000)
+    os.remove(removed)
+    calls = loader.calls
+    index.refresh()
+
+    assert loader.calls == calls + 2
+    assert index.get_by_uuid('uuid-b') is None
+    assert index.get_by_uuid('uuid-c').path == os.path.join(str(tmp_path), 'sub', 'c.yml')
+    assert index.query({'category': ['cot']})[0] == 1
+    assert index.facets()['category'] == {'cot': 1, 'qa': 1}
+
+
+def test_remove_file_drops_uuid_and_facets(tmp_path):
+    file_path = write_prompt(tmp_path, 'a', 'uuid-a')
+    write_prompt(tmp_path, 'b', 'uuid-b')
+    index, _ = make_index(tmp_path)
+    index.refresh_on_miss = False
+
+    index.remove_file(file_path)
+
+    assert index.get_by_uuid('uuid-a') is None
+    assert index.query({'category': ['qa']})[0] == 1
+    assert index.search('a')[0] == 0
+
+
+def test_snapshot_entries_parse_once_on_first_read(tmp_path):
+    file_path = write_prompt(tmp_path, 'a', 'uuid-a')
+    snapshot = {'prompts': [{'path': 'a.yml', 'mtime': os.stat(file_path).st_mtime, 'uuid': 'uuid-a',
+                             'title': 'a', 'category': 'qa', 'prompt': 'a {query}'}]}
+    loader = CountingLoader()
+    index = PromptIndex(str(tmp_path), TemplateCache(loader=loader), snapshot)
+    assert loader.calls == 0
+
+    entry = index.get_by_uuid('uuid-a')
+    assert index.document(entry).data['uuid'] == 'uuid-a'
+    assert index.document(index.get_by_uuid('uuid-a')).data['uuid'] == 'uuid-a'
+    assert loader.calls == 1
+
+
+def test_check_head_keeps_unchanged_documents(tmp_path):
+    kept = write_prompt(tmp_path, 'a', 'uuid-a')
+    edited = write_prompt(tmp_path, 'b', 'uuid-b', mtime=1000)
+    cache = TemplateCache()
+    cache.check_head(str(tmp_path), 'head-1')
+    cache.get_entry(kept)
+    cache.get_entry(edited)
+
+    write_prompt(tmp_path, 'b', 'uuid-changed', mtime=2000)
+    cache.check_head(str(tmp_path), 'head-2')
+
+    assert kept in cache.entries
+    assert edited not in cache.entries
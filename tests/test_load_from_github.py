@@ -0,0 +1,98 @@
+import os
+import threading
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from load_from_github import PromptLoader
+
+PROMPT = b'title: Zero-shot-CoT\nprompt: "{user_query} Let\'s think step by step."\n'
+ETAG = '"v1"'
+
+
+class PromptHandler(BaseHTTPRequestHandler):
+    statuses = []
+
+    def do_GET(self):
+        if self.path != '/deadbits/prompt-serve/main/prompts/cot/zeroshot.yml':
+            status, body = 404, b'not found'
+        elif self.headers.get('If-None-Match') == ETAG:
+            status, body = 304, b''
+        else:
+            status, body = 200, PROMPT
+
+        self.statuses.append(status)
+        self.send_response(status)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    PromptHandler.statuses = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), PromptHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def base_url(httpd):
+    return f'http://127.0.0.1:{httpd.server_address[1]}'
+
+
+def test_fetch_revalidate_then_offline(server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+
+    first = PromptLoader(base_url(server), cache_dir).get_template('deadbits/prompt-serve', 'cot/zeroshot')
+    again = PromptLoader(base_url(server), cache_dir).get_template('deadbits/prompt-serve', 'cot/zeroshot.yml')
+    assert PromptHandler.statuses == [200, 304]
+    assert first == again
+    assert first['title'] == 'Zero-shot-CoT'
+
+    server.shutdown()
+    offline = PromptLoader(base_url(server), cache_dir, offline=True)
+    assert offline.get_template('deadbits/prompt-serve', 'cot/zeroshot') == first
+    assert offline.get_template('deadbits/prompt-serve', 'cot/missing') is None
+    assert PromptHandler.statuses == [200, 304]
+
+
+def test_get_templates_maps_missing_prompts_to_none(server):
+    loader = PromptLoader(base_url(server), workers=2)
+    templates = loader.get_templates('deadbits/prompt-serve', ['cot/zeroshot', 'cot/missing'])
+
+    assert templates['cot/zeroshot']['title'] == 'Zero-shot-CoT'
+    assert templates['cot/missing'] is None
+
+
+
+def test_concurrent_cache_writes_of_one_url(tmp_path):
+    loader = PromptLoader(cache_dir=str(tmp_path))
+    url = 'https://example.com/deadbits/prompt-serve/main/prompts/cot/zeroshot.yml'
+    barrier = threading.Barrier(16)
+    errors = []
+
+    def write(i):
+        barrier.wait()
+        try:
+            for _ in range(20):
+                loader._write_cache(url, f'"v{i}"', PROMPT.decode())
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == [os.path.basename(loader._cache_path(url))]
+    assert loader._read_cache(url)['body'] == PROMPT.decode()
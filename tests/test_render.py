@@ -0,0 +1,23 @@
+import pytest
+
+from render import CompiledTemplate, RenderError
+
+
+def test_render_fills_variables_and_format_specs():
+    template = CompiledTemplate('{name!r} scored {score:.1f}', ['name', 'score'])
+    assert template.render({'name': 'a', 'score': 0.25}) == "'a' scored 0.2"
+
+
+@pytest.mark.parametrize('values', [{'score': 'high'}, {'score': [1, 2]}])
+def test_bad_format_spec_is_a_render_error(values):
+    template = CompiledTemplate('{score:.1f}', ['score'])
+    with pytest.raises(RenderError):
+        template.render(values)
+
+
+def test_missing_and_unknown_variables():
+    template = CompiledTemplate('{a} {b}')
+    with pytest.raises(RenderError, match='missing input variables: b'):
+        template.render({'a': 1})
+    with pytest.raises(RenderError, match='unknown input variables: c'):
+        template.render({'a': 1, 'b': 2, 'c': 3})
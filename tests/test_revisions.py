@@ -0,0 +1,34 @@
+import os
+import yaml
+import pytest
+
+from git import Repo
+
+from repos import RepoRegistry
+from revisions import RevisionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    repo_path = str(tmp_path / 'prompts')
+    repo = Repo.init(repo_path)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@localhost')
+    with open(os.path.join(repo_path, 'a.yml'), 'w') as f:
+        f.write('title: a\n')
+    repo.git.add('a.yml')
+    repo.index.commit('add a')
+    return RevisionStore(RepoRegistry(str(tmp_path)), yaml.safe_load), repo_path, repo
+
+
+def test_resolve_known_refs(store):
+    revisions, repo_path, repo = store
+    assert revisions.resolve(repo_path, 'HEAD') == repo.head.commit
+    assert revisions.resolve(repo_path, repo.head.commit.hexsha[:8]) == repo.head.commit
+
+
+@pytest.mark.parametrize('ref', ['@{-1}', 'HEAD@{1000}', 'nope', 'HEAD~5', '0' * 40])
+def test_unknown_refs_resolve_to_none(store, ref):
+    revisions, repo_path, _ = store
+    assert revisions.resolve(repo_path, ref) is None
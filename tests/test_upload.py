@@ -0,0 +1,197 @@
+import io
+import os
+import uuid
+import zipfile
+import threading
+import pytest
+
+PROMPT = '''title: Zero-shot-CoT
+uuid: {uuid}
+description: Zero-shot Chain of Thought.
+category: cot
+provider: openai
+model: gpt-3.5-turbo
+prompt: |
+  {{user_query}} Let's think step by step.
+input_variables:
+  - user_query
+tags:
+  - chain-of-thought
+'''
+
+
+def make_prompt(prompt_uuid=None) -> bytes:
+    return PROMPT.format(uuid=prompt_uuid or uuid.uuid4()).encode()
+
+
+def test_concurrent_uploads_with_one_uuid_accept_only_one(server):
+    api, _, repo_path = server
+    prompt_uuid = str(uuid.uuid4())
+    os.makedirs(os.path.join(repo_path, 'race'), exist_ok=True)
+    barrier = threading.Barrier(8)
+    results = {}
+
+    def upload(i):
+        file_path = os.path.join(repo_path, 'race', f'r{i}.yml')
+        tmp_path = api.upload_tmp_path(file_path)
+        with open(tmp_path, 'wb') as f:
+            f.write(make_prompt(prompt_uuid))
+        barrier.wait()
+        results[file_path] = api.install_upload(repo_path, file_path, tmp_path)
+
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    accepted = [file_path for file_path, errors in results.items() if not errors]
+    assert len(accepted) == 1
+    assert os.listdir(os.path.join(repo_path, 'race')) == [os.path.basename(accepted[0])]
+    for file_path, errors in results.items():
+        if file_path not in accepted:
+            assert 'is already used by' in errors[0]
+
+
+def wait_for_commit(api, client, ticket):
+    api.commits.flush()
+    while True:
+        status = client.get(f'/prompts/_commits/{ticket}').json()
+        if status['status'] != 'pending':
+            return status
+
+
+def test_failed_bulk_commit_restores_the_tree_and_index(server, monkeypatch):
+    api, client, repo_path = server
+    old_uuid, new_uuid, added_uuid = (str(uuid.uuid4()) for _ in range(3))
+    r = client.post('/prompts', files={'file': ('rollback/kept.yml', make_prompt(old_uuid))})
+    assert wait_for_commit(api, client, r.json()['ticket'])['status'] == 'committed'
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('commit failed')
+
+    monkeypatch.setattr(api, 'commit_files', fail)
+    files = [('files', ('rollback/kept.yml', make_prompt(new_uuid))),
+             ('files', ('rollback/added.yml', make_prompt(added_uuid)))]
+    r = client.post('/prompts/_bulk', files=files)
+
+    assert r.status_code == 400
+    assert sorted(os.listdir(os.path.join(repo_path, 'rollback'))) == ['kept.yml']
+    with open(os.path.join(repo_path, 'rollback', 'kept.yml'), 'rb') as f:
+        assert f.read() == make_prompt(old_uuid)
+    assert client.get(f'/prompts/_uuid/{old_uuid}').status_code == 200
+    assert client.get(f'/prompts/_uuid/{new_uuid}').status_code == 404
+    assert client.get(f'/prompts/_uuid/{added_uuid}').status_code == 404
+
+
+def test_reposting_an_identical_bulk_upload_makes_no_commit(server):
+    api, client, repo_path = server
+    files = [('files', ('same/a.yml', make_prompt())), ('files', ('same/b.yml', make_prompt()))]
+
+    first = client.post('/prompts/_bulk', files=files).json()
+    again = client.post('/prompts/_bulk', files=files).json()
+
+    assert first['status'] == 'committed'
+    assert again == {**first, 'status': 'unchanged'}
+
+
+def leftovers(repo_path):
+    # temp files of rejected uploads never stay behind
+    return [name for _, _, files in os.walk(repo_path) for name in files if name.endswith('.upload')]
+
+
+def files_under(path):
+    return [name for _, _, files in os.walk(path) for name in files]
+
+
+@pytest.mark.parametrize('name', ['../escape.yml', '.git/hooks/x.yml', '/abs/x.yml', 'notes.txt'])
+def test_upload_rejects_names_outside_the_repo(server, name):
+    _, client, repo_path = server
+    r = client.post('/prompts', files={'file': (name, make_prompt())})
+
+    assert r.status_code == 400
+    assert not os.path.exists(os.path.join(os.path.dirname(repo_path), 'escape.yml'))
+
+
+def test_upload_larger_than_max_upload_size_is_413(server):
+    _, client, repo_path = server
+    r = client.post('/prompts', files={'file': ('big/a.yml', make_prompt() + b'#' * 5000)})
+
+    assert r.status_code == 413
+    assert files_under(os.path.join(repo_path, 'big')) == []
+    assert leftovers(repo_path) == []
+
+
+def test_invalid_and_duplicate_uploads_are_422(server):
+    api, client, repo_path = server
+    prompt_uuid = str(uuid.uuid4())
+    r = client.post('/prompts', files={'file': ('dup/a.yml', make_prompt(prompt_uuid))})
+    assert r.status_code == 200
+
+    r = client.post('/prompts', files={'file': ('dup/b.yml', make_prompt(prompt_uuid))})
+    assert r.status_code == 422
+    assert 'is already used by dup/a.yml' in r.json()['detail']['errors'][0]
+
+    r = client.post('/prompts', files={'file': ('dup/c.yml', b'title: missing fields\n')})
+    assert r.status_code == 422
+    r = client.post('/prompts', files={'file': ('dup/d.yml', b'title: [unclosed\n')})
+    assert r.status_code == 422
+
+    assert sorted(os.listdir(os.path.join(repo_path, 'dup'))) == ['a.yml']
+    assert leftovers(repo_path) == []
+
+
+def test_bulk_rejects_every_file_when_one_is_invalid(server):
+    _, client, repo_path = server
+    prompt_uuid = str(uuid.uuid4())
+    files = [('files', ('bulk-bad/a.yml', make_prompt(prompt_uuid))),
+             ('files', ('bulk-bad/b.yml', make_prompt(prompt_uuid))),
+             ('files', ('../bulk-bad.yml', make_prompt()))]
+    r = client.post('/prompts/_bulk', files=files)
+
+    assert r.status_code == 422
+    results = {f['filename']: f for f in r.json()['detail']['files']}
+    assert 'is also used by bulk-bad/a.yml' in results['bulk-bad/b.yml']['errors'][0]
+    assert results['../bulk-bad.yml']['errors'] == ['file name is not allowed']
+    assert files_under(os.path.join(repo_path, 'bulk-bad')) == []
+    assert leftovers(repo_path) == []
+
+
+def zip_upload(members: dict):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    return {'archive': ('pack.zip', buf.getvalue())}
+
+
+@pytest.mark.parametrize('members', [
+    {f'many/{i}.yml': make_prompt() for i in range(6)},
+    {'bomb/a.yml': b'#' * 100000},
+    {f'wide/{i}.yml': make_prompt() + b'#' * 3500 for i in range(5)}
+])
+def test_bulk_limits_are_413(server, members):
+    _, client, repo_path = server
+    r = client.post('/prompts/_bulk', files=zip_upload(members))
+
+    assert r.status_code == 413
+    for name in ('many', 'bomb', 'wide'):
+        assert files_under(os.path.join(repo_path, name)) == []
+    assert leftovers(repo_path) == []
+
+
+def test_bulk_archive_is_committed_together(server):
+    api, client, repo_path = server
+    r = client.post('/prompts/_bulk', files=zip_upload({'pack/a.yml': make_prompt(), 'pack/b.yml': make_prompt(),
+                                                        'pack/README.md': b'skipped'}))
+
+    assert r.status_code == 200
+    assert [f['status'] for f in r.json()['files']] == ['valid', 'valid', 'skipped']
+    assert sorted(os.listdir(os.path.join(repo_path, 'pack'))) == ['a.yml', 'b.yml']
+    assert api.repos.get(repo_path).head.commit.hexsha == r.json()['commit']
+
+
+def test_bulk_rejects_unsupported_archives(server):
+    _, client, _ = server
+    assert client.post('/prompts/_bulk', files={'archive': ('pack.rar', b'x')}).status_code == 400
+    assert client.post('/prompts/_bulk', files={'archive': ('pack.zip', b'not a zip')}).status_code == 400
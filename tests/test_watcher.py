@@ -0,0 +1,61 @@
+import os
+import pytest
+
+from collections import namedtuple
+
+from watcher import RepoWatcher, ADDED, RESCAN
+
+inotify = pytest.importorskip('inotify_simple')
+
+Event = namedtuple('Event', ['wd', 'mask', 'cookie', 'name'])
+
+
+def make_watcher(mode='inotify'):
+    watcher = RepoWatcher(mode, interval=0.0)
+    events = []
+    watcher.subscribe(lambda repo_path, kind, file_path: events.append((kind, file_path)))
+    return watcher, events
+
+
+def test_watch_reconciles_with_the_index(tmp_path):
+    watcher, events = make_watcher()
+    watcher.watch(str(tmp_path))
+    watcher.backend.close()
+
+    assert events == [(RESCAN, str(tmp_path))]
+
+
+def test_queue_overflow_rescans_every_repo(tmp_path):
+    repo_path = str(tmp_path)
+    watcher, events = make_watcher()
+    watcher.watch(repo_path)
+    os.mkdir(os.path.join(repo_path, 'missed'))
+    events.clear()
+
+    watcher.backend.process([Event(-1, inotify.flags.Q_OVERFLOW, 0, '')])
+
+    assert events == [(RESCAN, repo_path)]
+    assert os.path.join(repo_path, 'missed') in {root for _, root in watcher.backend.watches.values()}
+    watcher.backend.close()
+
+
+def test_failed_watch_falls_back_to_polling(tmp_path):
+    repo_path = str(tmp_path)
+    watcher, events = make_watcher()
+
+    def add_watch(path, mask):
+        raise OSError(28, 'No space left on device')
+
+    watcher.backend.inotify.add_watch = add_watch
+    watcher.watch(repo_path)
+    assert repo_path in watcher.backend.fallback.repos
+    assert not watcher.backend.watches
+
+    events.clear()
+    file_path = os.path.join(repo_path, 'new.yml')
+    with open(file_path, 'w') as f:
+        f.write('title: new\n')
+    watcher.backend.process([])
+
+    assert events == [(ADDED, file_path)]
+    watcher.backend.close()
@@ -6,21 +6,16 @@ import uuid
 import argparse
 import configparser
 import json
-import yaml
-import pandas as pd
+import hashlib
+import yamlio
 
 from rich import print as rprint
 from rich.prompt import Prompt
 from git import Repo
-from collections import defaultdict 
-from pykwalify.core import Core
 from langchain import PromptTemplate
-
-
-statistics = defaultdict(lambda: defaultdict(int))
-seen_uuids = set()
-passed = 0
-failed = 0
+from concurrent.futures import ProcessPoolExecutor
+from corpus import iter_prompts, find_prompts, read_prompt, read_prompts, scan, StatsCollector
+from snapshot import build_snapshot, write_snapshot
 
 
 class Config:
@@ -62,23 +57,25 @@ def init_repo(config):
         sys.exit(1)
 
 
+def to_langchain(data):
+    prompt = data['prompt']
+
+    # check if prompt-serve template contains input variables
+    if 'input_variables' in data.keys():
+        input_vars = data['input_variables']
+        return PromptTemplate(template=prompt, input_variables=input_vars)
+
+    # otherwise we only use the prompt
+    return PromptTemplate(template=prompt, input_variables=[])
+
+
 def convert_to_langchain(fpath):
     rprint(f'[bold green](status)[/bold green] converting template {fpath}')
     
     with open(fpath, 'r') as fp:
         try:
-            data = yaml.safe_load(fp)
-            prompt = data['prompt']
-            
-            # check if prompt-serve template contains input variables
-            if 'input_variables' in data.keys():
-                input_vars = data['input_variables']
-                langchain_template = PromptTemplate(template=prompt, input_variables=input_vars)
-            
-            # otherwise we only use the prompt
-            else:
-                langchain_template = PromptTemplate(template=prompt, input_variables=[])
-     
+            data = yamlio.load(fp)
+            langchain_template = to_langchain(data)
             return (data, langchain_template)
      
         except Exception as err:
@@ -87,6 +84,158 @@ def convert_to_langchain(fpath):
             return (None, None)
 
 
+def convert_file(fpath):
+    # batch worker, returns (fpath, template dict, error)
+    record = read_prompt(fpath)
+    if record.data is None:
+        return (fpath, None, record.error)
+
+    try:
+        return (fpath, to_langchain(record.data).dict(), None)
+    except Exception as err:
+        return (fpath, None, str(err))
+
+
+def load_conversion_cache(cache_path):
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_conversion_cache(cache_path, cache):
+    tmp_path = f'{cache_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, default=str)
+    os.replace(tmp_path, cache_path)
+
+
+def convert_directory(dir_path, output, jobs=1, cache_path=None):
+    # stream every prompt as one LangChain PromptTemplate per line, unchanged files come from the cache
+    paths = find_prompts(dir_path)
+    cache = load_conversion_cache(cache_path)
+    digests = {}
+    pending = []
+
+    for fpath in paths:
+        key = os.path.relpath(fpath, dir_path)
+        with open(fpath, 'rb') as f:
+            digests[key] = hashlib.sha256(f.read()).hexdigest()
+        if cache.get(key, {}).get('hash') != digests[key]:
+            pending.append(fpath)
+
+    pool = None
+    if jobs > 1 and len(pending) > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(convert_file, pending, chunksize=max(1, len(pending) // (jobs * 4)))
+    else:
+        results = map(convert_file, pending)
+
+    pending = set(pending)
+    converted = reused = failed = 0
+
+    try:
+        for fpath in paths:
+            key = os.path.relpath(fpath, dir_path)
+
+            if fpath in pending:
+                _, template, error = next(results)
+                if error is not None:
+                    rprint(f'[bold red](error)[/bold red] failed to convert prompt: {fpath} - {error}', file=sys.stderr)
+                    cache.pop(key, None)
+                    failed += 1
+                    continue
+
+                cache[key] = {'hash': digests[key], 'template': template}
+                converted += 1
+            else:
+                template = cache[key]['template']
+                reused += 1
+
+            output.write(json.dumps({'path': key, 'template': template}, default=str) + '\n')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if cache_path:
+        save_conversion_cache(cache_path, {key: value for key, value in cache.items() if key in digests})
+
+    rprint(f'[bold green](status)[/bold green] converted {converted}, unchanged {reused}, failed {failed}', file=sys.stderr)
+    return failed
+
+
+def export_prompts(dir_path, output):
+    # one JSON object per prompt, files are read one at a time so memory use stays flat
+    exported = failed = 0
+
+    for fpath in iter_prompts(dir_path):
+        record = read_prompt(fpath)
+        if record.data is None:
+            rprint(f'[bold red](error)[/bold red] failed to export prompt: {fpath} - {record.error}', file=sys.stderr)
+            failed += 1
+            continue
+
+        line = {'path': os.path.relpath(fpath, dir_path), 'data': record.data}
+        output.write(json.dumps(line, default=str) + '\n')
+        exported += 1
+
+    rprint(f'[bold green](status)[/bold green] exported {exported} prompts, failed {failed}', file=sys.stderr)
+    return failed
+
+
+def import_prompts(lines, repo_path, batch_size=1000):
+    # write every JSON line back to a YAML file, then commit them all at once
+    try:
+        repo = Repo(repo_path)
+    except Exception as err:
+        rprint(f'[bold red](error)[/bold red] not a git repository: {repo_path} - {err}')
+        sys.exit(1)
+
+    root = os.path.realpath(repo_path)
+    staged = []
+    imported = failed = 0
+
+    def stage():
+        repo.git.add(staged)
+        staged.clear()
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            item = json.loads(line)
+            fpath = os.path.realpath(os.path.join(root, item['path']))
+            if not fpath.startswith(root + os.sep) or '.git' in os.path.relpath(fpath, root).split(os.sep):
+                raise ValueError(f'path is outside the repository: {item["path"]}')
+
+            os.makedirs(os.path.dirname(fpath), exist_ok=True)
+            with open(fpath, 'w') as f:
+                yamlio.dump(item['data'], f, sort_keys=False)
+        except Exception as err:
+            rprint(f'[bold red](error)[/bold red] failed to import line {number}: {err}')
+            failed += 1
+            continue
+
+        staged.append(fpath)
+        imported += 1
+
+        # stage in chunks to keep git command lines short
+        if len(staged) >= batch_size:
+            stage()
+
+    if staged:
+        stage()
+
+    if imported:
+        commit = repo.index.commit(f'Import {imported} prompts')
+        rprint(f'[bold green](status)[/bold green] imported {imported} prompts in commit {commit.hexsha}, failed {failed}')
+    else:
+        rprint(f'[bold red](error)[/bold red] no prompts imported, failed {failed}')
+
+    return failed
+
+
 def ask_for_input(field_name, field_type, is_required, default_value=None):
     value = None
     
@@ -143,57 +292,29 @@ def create_prompt():
 def save_prompt(prompt, filename):
     try:
         with open(filename, 'w') as f:
-            yaml.dump(prompt, f, sort_keys=False)
+            yamlio.dump(prompt, f, sort_keys=False)
         rprint(f'[bold green](status)[/bold green] prompt saved to {filename}')
     except Exception as e:
         rprint(f'[bold red](error)[/bold red] failed to save prompt: {e}')
 
 
-def collect_stats_from_file(file_path):
-    with open(file_path, 'r') as file:
-        try:
-            data = yaml.safe_load(file)
-
-            if 'category' in data:
-                statistics['category'][data['category']] += 1
-            if 'provider' in data:
-                statistics['provider'][data['provider']] += 1
-            if 'model' in data:
-                statistics['model'][data['model']] += 1
-
-            for tag in data.get('tags', []):
-                statistics['tags'][tag] += 1
+def compile_index(repo_path):
+    try:
+        repo = Repo(repo_path)
+    except Exception as err:
+        rprint(f'[bold red](error)[/bold red] not a git repository: {repo_path} - {err}')
+        sys.exit(1)
 
-        except yaml.YAMLError as err:
-            rprint(f'[bold red](error)[/bold red] error getting stats from {file_path}: {err}')
+    head = repo.head.commit.hexsha if repo.head.is_valid() else None
+    snapshot = build_snapshot(repo_path, head)
+    path = write_snapshot(repo_path, snapshot)
+    rprint(f'[bold green](status)[/bold green] compiled {len(snapshot["prompts"])} prompts at {head} to {path}')
 
 
 def collect_stats_from_dir(dir_path):
-    for root, _, files in os.walk(dir_path):
-        for file in files:
-            if file.endswith('.yaml') or file.endswith('.yml'):
-                collect_stats_from_file(os.path.join(root, file))
-
-
-def display_stats():
-    # convert dictionary to dataframe
-    df = pd.DataFrame.from_dict({(i,j): statistics[i][j] 
-                            for i in statistics.keys() 
-                            for j in statistics[i].keys()},
-                            orient='index', columns=['Count'])
-
-    dfs = {field: pd.DataFrame(list(values.items()), columns=[field, 'Count']).sort_values('Count', ascending=False) 
-        for field, values in statistics.items()}
-
-    # Print our statistics in separate tables
-    for field, df in dfs.items():
-        rprint(f'[bold]{field}[/bold]')
-        if field == 'tags':
-            print('(top 5)')
-            print(df.head(5).to_string(index=False))  # Only display top 5 for tags
-        else:
-            print(df.to_string(index=False))
-        print('\n')
+    stats = StatsCollector()
+    scan(read_prompts(find_prompts(dir_path)), [stats])
+    return stats
 
 
 if __name__ == '__main__':
@@ -223,10 +344,69 @@ if __name__ == '__main__':
         help='show statistics for directory of prompts'
     )
 
+    parser.add_argument(
+        '-x', '--compile',
+        action='store',
+        help='compile a prompt repository into an index snapshot for the API server'
+    )
+
+    parser.add_argument(
+        '-e', '--export',
+        action='store',
+        help='export a directory of prompts as NDJSON to stdout or --output'
+    )
+
+    parser.add_argument(
+        '--import',
+        action='store',
+        dest='import_file',
+        help='import prompts from an NDJSON file (- for stdin) into --repo with a single commit'
+    )
+
+    parser.add_argument(
+        '-r', '--repo',
+        action='store',
+        help='git repository to import prompts into'
+    )
+
     parser.add_argument(
         '-l', '--langchain',
         action='store',
-        help='convert prompt-serve template to langchain PromptTemplate'
+        help='convert prompt-serve template (or a directory of templates) to langchain PromptTemplate'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        action='store',
+        help='write directory conversions or exports to this NDJSON file instead of stdout'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=int,
+        default=1,
+        help='number of processes used to convert a directory'
+    )
+
+    parser.add_argument(
+        '--cache',
+        action='store',
+        help='content hash cache for directory conversions, unchanged templates are not converted again'
+    )
+
+    parser.add_argument(
+        '--stats-format',
+        action='store',
+        choices=StatsCollector.FORMATS,
+        default='table',
+        help='statistics output: table, json, csv (tidy field/value/category/count rows) or parquet'
+    )
+
+    parser.add_argument(
+        '--stats-output',
+        action='store',
+        help='write json, csv or parquet statistics to this file instead of stdout'
     )
 
     args = parser.parse_args()
@@ -252,14 +432,57 @@ if __name__ == '__main__':
             rprint(f'[bold red](error)[/bold red] {args.stats} is not a valid directory')
             sys.exit(1)
 
-        collect_stats_from_dir(args.stats)
-        display_stats()
+        stats = collect_stats_from_dir(args.stats)
+        try:
+            stats.write(args.stats_format, args.stats_output)
+        except (ValueError, ImportError) as err:
+            rprint(f'[bold red](error)[/bold red] failed to write statistics: {err}')
+            sys.exit(1)
     
+    if args.compile:
+        if not os.path.isdir(args.compile):
+            rprint(f'[bold red](error)[/bold red] {args.compile} is not a valid directory')
+            sys.exit(1)
+
+        compile_index(args.compile)
+
+    if args.export:
+        if not os.path.isdir(args.export):
+            rprint(f'[bold red](error)[/bold red] {args.export} is not a valid directory')
+            sys.exit(1)
+
+        if args.output:
+            with open(args.output, 'w') as output:
+                failed = export_prompts(args.export, output)
+        else:
+            failed = export_prompts(args.export, sys.stdout)
+        sys.exit(1 if failed else 0)
+
+    if args.import_file:
+        if not args.repo:
+            rprint(f'[bold red](error)[/bold red] --repo is required for import')
+            sys.exit(1)
+
+        if args.import_file == '-':
+            failed = import_prompts(sys.stdin, args.repo)
+        else:
+            with open(args.import_file, 'r') as lines:
+                failed = import_prompts(lines, args.repo)
+        sys.exit(1 if failed else 0)
+
     if args.langchain:
         if not os.path.exists(args.langchain):
             rprint(f'[bold red](error)[/bold red] template does not exist: {args.langchain}')
             sys.exit(1)
 
+        if os.path.isdir(args.langchain):
+            if args.output:
+                with open(args.output, 'w') as output:
+                    failed = convert_directory(args.langchain, output, args.jobs, args.cache)
+            else:
+                failed = convert_directory(args.langchain, sys.stdout, args.jobs, args.cache)
+            sys.exit(1 if failed else 0)
+
         original, langchain_template = convert_to_langchain(args.langchain)
         if original is None or langchain_template is None:
             rprint(f'[bold red](error)[/bold red] failed to convert prompt: {args.langchain}')
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# corpus.py
+# github.com/deadbits/prompt-serve
+# walk a directory of prompts once and feed every parsed file to a set of consumers
+import sys
+import json
+import uuid
+import hashlib
+import yamlio
+import pandas as pd
+
+from rich import print as rprint
+from concurrent.futures import ProcessPoolExecutor
+from pykwalify.core import Core
+from repofiles import iter_prompts, find_prompts
+
+
+# parsed schema for worker processes, set by init_worker
+SCHEMA = None
+
+
+class Record:
+    # one scanned prompt file, data is None when the file could not be parsed
+    def __init__(self, path, data, error=None, digest=None):
+        self.path = path
+        self.data = data
+        self.error = error
+        self.digest = digest
+
+
+def load_schema(schema_path):
+    with open(schema_path, 'r') as f:
+        return yamlio.load(f)
+
+
+def read_prompt(file_path, schema=None):
+    # parse a file exactly once and validate it against the schema if one is given
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        data = yamlio.load(content)
+    except (OSError, yamlio.YAMLError) as e:
+        return Record(file_path, None, str(e))
+
+    digest = hashlib.sha256(content).hexdigest()
+    if not isinstance(data, dict):
+        return Record(file_path, None, 'prompt must be a YAML mapping', digest)
+
+    if schema is not None:
+        c = Core(source_data=data, schema_data=schema)
+        try:
+            c.validate()
+        except Exception as e:
+            return Record(file_path, data, str(e), digest)
+
+    return Record(file_path, data, None, digest)
+
+
+def init_worker(schema):
+    # runs once in each worker process so the schema isn't sent with every file
+    global SCHEMA
+    SCHEMA = schema
+
+
+def _read_in_worker(file_path):
+    return read_prompt(file_path, SCHEMA)
+
+
+def read_prompts(paths, schema=None, jobs=1):
+    # yields records in input order, parsing across a process pool when jobs > 1
+    if jobs > 1 and len(paths) > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(schema,))
+        with pool:
+            yield from pool.map(_read_in_worker, paths, chunksize=max(1, len(paths) // (jobs * 4)))
+    else:
+        for file_path in paths:
+            yield read_prompt(file_path, schema)
+
+
+def scan(records, consumers):
+    # feed every record to each consumer, in order
+    for record in records:
+        for consumer in consumers:
+            consumer.consume(record)
+
+
+class UUIDChecker:
+    # reports uuids that were already seen earlier in the scan
+    def __init__(self, create=False):
+        self.create = create
+        self.seen = set()
+        self.duplicates = []
+
+    def consume(self, record):
+        if record.data is None:
+            return
+
+        f_uuid = record.data.get('uuid')
+
+        if f_uuid in self.seen:
+            rprint(f'[bold red](error)[/bold red] UUID {f_uuid} in file {record.path} is not unique.')
+            self.duplicates.append(record.path)
+
+            # create a new uuid if requested
+            if self.create:
+                new_uuid = str(uuid.uuid4())
+                rprint(f'[bold blue](new uuid)[/bold blue] {new_uuid}')
+
+        self.seen.add(f_uuid)
+
+
+class StatsCollector:
+    # collects one row per prompt, distributions and cross-tabs are computed on the whole frame at the end
+    FIELDS = ('category', 'provider', 'model', 'tags')
+    FORMATS = ('table', 'json', 'csv', 'parquet')
+
+    def __init__(self):
+        self.rows = []
+
+    def consume(self, record):
+        data = record.data
+        if data is None:
+            return
+
+        self.rows.append(tuple(data.get(field) for field in self.FIELDS))
+
+    def frame(self):
+        df = pd.DataFrame.from_records(self.rows, columns=self.FIELDS)
+        # non-list tags would explode into characters
+        df['tags'] = df['tags'].map(lambda tags: tags if isinstance(tags, list) else [])
+        return df
+
+    def distributions(self, df=None) -> dict:
+        df = self.frame() if df is None else df
+        columns = {field: df[field] for field in self.FIELDS if field != 'tags'}
+        columns['tags'] = df['tags'].explode()
+
+        return {field: column.dropna().value_counts().rename_axis(field).reset_index(name='Count')
+                for field, column in columns.items()}
+
+    def crosstab(self, df=None, index: str = 'model', columns: str = 'category'):
+        df = self.frame() if df is None else df
+        return pd.crosstab(df[index], df[columns])
+
+    def counts(self):
+        # tidy (field, value, category, count) rows, crosstab cells are under field model_by_category
+        df = self.frame()
+        parts = [dist.rename(columns={field: 'value', 'Count': 'count'}).assign(field=field)
+                 for field, dist in self.distributions(df).items()]
+
+        cells = self.crosstab(df).stack()
+        cells = cells[cells > 0].rename('count').reset_index()
+        parts.append(cells.rename(columns={'model': 'value'}).assign(field='model_by_category'))
+
+        return pd.concat(parts, ignore_index=True)[['field', 'value', 'category', 'count']]
+
+    def to_dict(self) -> dict:
+        df = self.frame()
+        table = self.crosstab(df)
+        return {
+            'prompts': len(df),
+            # yaml values such as dates or numbers become string keys, json only allows strings
+            'distributions': {field: {str(value): count for value, count in zip(dist[field], dist['Count'].tolist())}
+                              for field, dist in self.distributions(df).items()},
+            'model_by_category': {str(model): {str(category): int(n) for category, n in row.items() if n}
+                                  for model, row in table.iterrows()}
+        }
+
+    def write(self, fmt: str, output=None):
+        # json and csv go to stdout without an output path, parquet needs pyarrow or fastparquet
+        if fmt == 'table':
+            self.display()
+        elif fmt == 'json':
+            text = json.dumps(self.to_dict(), indent=2)
+            if output:
+                with open(output, 'w') as f:
+                    f.write(text + '\n')
+            else:
+                print(text)
+        elif fmt == 'csv':
+            self.counts().to_csv(output or sys.stdout, index=False)
+        elif fmt == 'parquet':
+            if not output:
+                raise ValueError('parquet output needs an output file')
+            self.counts().to_parquet(output, index=False)
+        else:
+            raise ValueError(f'unknown stats format: {fmt}')
+
+    def display(self):
+        df = self.frame()
+
+        # Print our statistics in separate tables
+        for field, dist in self.distributions(df).items():
+            if dist.empty:
+                continue
+            rprint(f'[bold]{field}[/bold]')
+            if field == 'tags':
+                print('(top 5)')
+                print(dist.head(5).to_string(index=False))
+            else:
+                print(dist.to_string(index=False))
+            print('\n')
+
+        if len(df):
+            rprint('[bold]model x category[/bold]')
+            print(self.crosstab(df).to_string())
+            print('\n')
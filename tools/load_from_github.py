@@ -6,38 +6,120 @@
 import os
 import sys
 import json
-import yaml
+import hashlib
+import tempfile
+import yamlio
 import argparse
 import requests
 
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
 
 class PromptLoader:    
-    def __init__(self):
-        self.base_url = 'https://raw.githubusercontent.com'
+    def __init__(self, base_url='https://raw.githubusercontent.com', cache_dir=None, offline=False, timeout=10, workers=8):
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.timeout = timeout
+        self.workers = workers
 
+        # one pooled session so concurrent fetches reuse connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
 
-    def get_template(self, full_repo_name, full_prompt_name) -> str:
-        prompt_data = None
 
+    def build_url(self, full_repo_name, full_prompt_name):
         try:
             repo_user, repo_name = full_repo_name.split('/')
         except Exception as err:
             print(f'(error) failed to parse repo name - exception: {err}')
             print('name should be in the format of username/repo')
-            return prompt_data
-    
-        url = f'{self.base_url}/{repo_user}/{repo_name}/main/prompts/{full_prompt_name}.yml'
-        full_prompt_name = full_prompt_name + '.yml' if not full_prompt_name.endswith('.yml') else full_prompt_name
+            return None
+
+        if full_prompt_name.endswith('.yml'):
+            full_prompt_name = full_prompt_name[:-len('.yml')]
+
+        return f'{self.base_url}/{repo_user}/{repo_name}/main/prompts/{full_prompt_name}.yml'
+
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+
+    def _read_cache(self, url):
+        if not self.cache_dir:
+            return None
+
+        try:
+            with open(self._cache_path(url), 'r') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+
+    def _write_cache(self, url, etag, body):
+        if not self.cache_dir:
+            return
+
+        # a temp file per writer, concurrent fetches of the same url must not share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'url': url, 'etag': etag, 'body': body}, fp)
+            os.replace(tmp_path, self._cache_path(url))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+    def fetch(self, url):
+        # returns the response body, revalidating cached copies with If-None-Match
+        cached = self._read_cache(url)
+
+        if self.offline:
+            if cached is None:
+                print(f'(error) template not in cache (offline): {url}')
+                return None
+            return cached['body']
+
+        headers = {}
+        if cached is not None and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
 
         print(f'(status) retrieving template: {url}')
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached is not None:
+            return cached['body']
+
+        if response.status_code != 200:
+            print(f'(error) error retrieving template - non 200 status code: {response.status_code}')
+            return None
+
+        self._write_cache(url, response.headers.get('ETag'), response.text)
+        return response.text
+
+
+    def get_template(self, full_repo_name, full_prompt_name) -> str:
+        prompt_data = None
+
+        url = self.build_url(full_repo_name, full_prompt_name)
+        if url is None:
+            return prompt_data
     
         try:
-            response = requests.get(url)
-            if response.status_code != 200:
-                print(f'(error) error retrieving template - non 200 status code: {response.status_code}')
+            body = self.fetch(url)
+            if body is None:
                 return prompt_data
     
-            prompt_data = yaml.safe_load(response.text)
+            prompt_data = yamlio.load(body)
 
         except Exception as err:
             print(f'(error) error retrieving template - exception: {err}')
@@ -46,6 +128,13 @@ class PromptLoader:
         return prompt_data
 
 
+    def get_templates(self, full_repo_name, prompt_names) -> dict:
+        # fetch many category/name templates concurrently, missing templates map to None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(lambda name: self.get_template(full_repo_name, name), prompt_names)
+            return dict(zip(prompt_names, results))
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Validate YAML prompts against the prompt-serve schema.')
     
@@ -58,14 +147,15 @@ if __name__ == '__main__':
 
     parser.add_argument(
         '-p', '--prompt',
-        help='prompt as category/name (e.g. instruct/summarize)',
+        help='one or more prompts as category/name (e.g. instruct/summarize)',
         required=True,
+        nargs='+',
         action='store'
     )
 
     parser.add_argument(
         '-s', '--save', 
-        help='save prompt to file', 
+        help='save prompt to file (a directory when loading several prompts)', 
         required=False,
         action='store'
     )
@@ -77,26 +167,86 @@ if __name__ == '__main__':
         action='store_true'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '-c', '--cache-dir',
+        help='directory used to cache templates between runs',
+        required=False,
+        default=None
+    )
+
+    parser.add_argument(
+        '-o', '--offline',
+        help='only serve templates from the cache',
+        required=False,
+        action='store_true'
+    )
 
-    loader = PromptLoader()
-    prompt_data = loader.get_template(args.repo, args.prompt)
+    parser.add_argument(
+        '-w', '--workers',
+        help='number of concurrent downloads',
+        required=False,
+        type=int,
+        default=8
+    )
 
-    if prompt_data is None:
+    parser.add_argument(
+        '-b', '--base-url',
+        help='base url to load templates from',
+        required=False,
+        default='https://raw.githubusercontent.com'
+    )
+
+    args = parser.parse_args()
+
+    if args.offline and not args.cache_dir:
+        print('(error) --offline requires --cache-dir')
         sys.exit(1)
 
-    if args.save:
-        if os.path.exists(args.save):
-            print(f'(error) file already exists: {args.save}')
+    loader = PromptLoader(args.base_url, args.cache_dir, args.offline, workers=args.workers)
+
+    if len(args.prompt) == 1:
+        prompt_data = loader.get_template(args.repo, args.prompt[0])
+        if prompt_data is None:
             sys.exit(1)
+
+        if args.save:
+            if os.path.exists(args.save):
+                print(f'(error) file already exists: {args.save}')
+                sys.exit(1)
+            
+            with open(args.save, 'w') as fp:
+                yamlio.dump(prompt_data, fp)
+            
+            print(f'(status) prompt saved to file: {args.save}')
         
-        with open(args.save, 'w') as fp:
-            yaml.dump(prompt_data, fp)
-        
-        print(f'(status) prompt saved to file: {args.save}')
-    
+        elif args.json:
+            print(json.dumps(prompt_data, indent=2))
+        else:
+            print(yamlio.dump(prompt_data, indent=2))
+
+        sys.exit(0)
+
+    templates = loader.get_templates(args.repo, args.prompt)
+    missing = [name for name, data in templates.items() if data is None]
+
+    if args.save:
+        for name, prompt_data in templates.items():
+            if prompt_data is None:
+                continue
+
+            path = os.path.join(args.save, f'{name}.yml' if not name.endswith('.yml') else name)
+            if os.path.exists(path):
+                print(f'(error) file already exists: {path}')
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as fp:
+                yamlio.dump(prompt_data, fp)
+            print(f'(status) prompt saved to file: {path}')
+
     elif args.json:
-        print(json.dumps(prompt_data, indent=2))
+        print(json.dumps(templates, indent=2))
     else:
-        print(yaml.dump(prompt_data, indent=2))
+        print(yamlio.dump(templates, indent=2))
 
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# repofiles.py
+# github.com/deadbits/prompt-serve
+# prompt files in a repository and their git object ids, standard library only so the server can import it
+import os
+import hashlib
+
+
+def iter_prompts(directory_path):
+    # walk the directory and yield every yaml file in a stable order
+    for root, dirs, files in os.walk(directory_path):
+        # never descend into git metadata
+        dirs[:] = sorted(d for d in dirs if d != '.git')
+
+        for file in sorted(files):
+            if file.endswith('.yaml') or file.endswith('.yml'):
+                yield os.path.join(root, file)
+
+
+def find_prompts(directory_path):
+    return list(iter_prompts(directory_path))
+
+
+def git_blob_sha(content):
+    # same object id git assigns to the file contents
+    header = f'blob {len(content)}\0'.encode()
+    return hashlib.sha1(header + content).hexdigest()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# snapshot.py
+# github.com/deadbits/prompt-serve
+# compile a prompt repository into a single index file the server can load in one read
+import os
+import json
+import yamlio
+
+from repofiles import find_prompts, git_blob_sha
+
+
+SNAPSHOT_NAME = 'prompt-serve-index.json'
+SNAPSHOT_VERSION = 1
+
+# metadata copied into the snapshot for every prompt
+SNAPSHOT_FIELDS = ('uuid', 'title', 'description', 'category', 'provider', 'model', 'tags', 'packs', 'input_variables', 'prompt')
+
+
+def snapshot_path(repo_path):
+    # kept inside .git so it never shows up in the working tree
+    return os.path.join(repo_path, '.git', SNAPSHOT_NAME)
+
+
+def build_snapshot(repo_path, head):
+    prompts = []
+
+    for file_path in find_prompts(repo_path):
+        # the server only serves .yml prompts
+        if not file_path.endswith('.yml'):
+            continue
+
+        try:
+            mtime = os.stat(file_path).st_mtime
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            data = yamlio.load(content)
+        except (OSError, yamlio.YAMLError):
+            continue
+
+        if not isinstance(data, dict):
+            continue
+
+        rel_path = os.path.relpath(file_path, repo_path)
+        entry = {field: data[field] for field in SNAPSHOT_FIELDS if field in data}
+        entry['path'] = rel_path
+        entry['name'] = rel_path[:-len('.yml')]
+        entry['blob'] = git_blob_sha(content)
+        entry['mtime'] = mtime
+        prompts.append(entry)
+
+    return {'version': SNAPSHOT_VERSION, 'head': head, 'prompts': prompts}
+
+
+def write_snapshot(repo_path, snapshot):
+    path = snapshot_path(repo_path)
+    tmp_path = f'{path}.tmp'
+
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'), default=str)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_snapshot(repo_path, head):
+    # returns None when there is no snapshot or it was built for another HEAD
+    path = snapshot_path(repo_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('head') != head:
+        return None
+
+    return snapshot
+
+
+def ensure_snapshot(repo_path, head):
+    # load the current snapshot, rebuilding it when HEAD moved
+    snapshot = load_snapshot(repo_path, head)
+    if snapshot is None:
+        snapshot = build_snapshot(repo_path, head)
+        write_snapshot(repo_path, snapshot)
+
+    return snapshot
@@ -4,106 +4,150 @@
 # validate prompt-serve yaml files against the schema
 import os
 import sys
-import uuid
+import json
+import hashlib
 import argparse
-import yaml
-import pandas as pd
+import subprocess
 
 from rich import print as rprint
-from collections import defaultdict
-from pykwalify.core import Core
+from corpus import Record, find_prompts, load_schema, read_prompt, read_prompts, scan, UUIDChecker, StatsCollector
 
 
-# store uuids in a set to check for uniqueness
-seen_uuids = set()
-statistics = defaultdict(lambda: defaultdict(int))
-passed = 0
-failed = 0
+# parsed schema, loaded once and shared by every validation
+SCHEMA = None
 
+# fields kept in the incremental cache, enough for uuid checks and stats
+SUMMARY_FIELDS = ('uuid', 'category', 'provider', 'model', 'tags')
 
-def collect_stats_from_file(file_path):
-    with open(file_path, 'r') as file:
-        try:
-            data = yaml.safe_load(file)
 
-            if 'category' in data:
-                statistics['category'][data['category']] += 1
-            if 'provider' in data:
-                statistics['provider'][data['provider']] += 1
-            if 'model' in data:
-                statistics['model'][data['model']] += 1
+class ValidationReporter:
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
 
-            for tag in data.get('tags', []):
-                statistics['tags'][tag] += 1
+    def consume(self, record):
+        if record.error is None:
+            rprint(f'[bold green](status)[/bold green] {record.path} is valid.')
+            self.passed += 1
+        else:
+            rprint(f'[bold red](error)[/bold red] {record.path} is invalid: {record.error}')
+            self.failed += 1
 
-        except yaml.YAMLError as err:
-            rprint(f'[bold red](error)[/bold red] error getting stats from {file_path}: {err}')
 
+def summarize(data):
+    return {field: data[field] for field in SUMMARY_FIELDS if field in data}
 
-def validate_file(file_path, create=False):
-    global passed, failed
-    # load the yaml file
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
 
-    # check for uniqueness of uuid
-    f_uuid = data.get('uuid')
+def schema_digest(schema):
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
 
-    if f_uuid in seen_uuids:
-        rprint(f'[bold red](error)[/bold red] UUID {f_uuid} in file {file_path} is not unique.')
 
-        # create a new uuid if requested
-        if create:
-            new_uuid = str(uuid.uuid4())
-            rprint(f'[bold blue](new uuid)[/bold blue] {new_uuid}')
-    
-    seen_uuids.add(f_uuid)
+def file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_cache(cache_path, schema):
+    # returns (files, commit the cache was written at); results are only valid for the schema they were produced with
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        if cache.get('schema') == schema_digest(schema):
+            return cache['files'], cache.get('commit')
+    return {}, None
+
 
-    # validate against the schema
-    c = Core(source_data=data, schema_files=[SCHEMA_PATH])
+def save_cache(cache_path, schema, files, commit=None):
+    tmp_path = f'{cache_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        # prompts may hold YAML dates and other values json can't encode
+        json.dump({'schema': schema_digest(schema), 'commit': commit, 'files': files}, f, default=str)
+    os.replace(tmp_path, cache_path)
 
+
+def resolve_commit(directory_path, ref):
+    # full sha of ref, None outside a git repository or for an unknown ref
     try:
-        c.validate()
-        rprint(f'[bold green](status)[/bold green] {file_path} is valid.')
-        passed += 1
-    except Exception as e:
-        rprint(f'[bold red](error)[/bold red] {file_path} is invalid: {str(e)}')
-        failed += 1
-
-
-def validate_directory(directory_path, create=False, stats=False):
-    # walk the directory and validate each file
-    for root, dirs, files in os.walk(directory_path):
-
-        for file in files:
-            # only validate yaml files
-            if file.endswith('.yaml') or file.endswith('.yml'):
-                file_path = os.path.join(root, file)
-                validate_file(file_path, create)
-                
-                if stats:
-                    collect_stats_from_file(file_path)
-
-
-def display_stats():
-    # convert dictionary to dataframe
-    df = pd.DataFrame.from_dict({(i,j): statistics[i][j] 
-                            for i in statistics.keys() 
-                            for j in statistics[i].keys()},
-                            orient='index', columns=['Count'])
-
-    dfs = {field: pd.DataFrame(list(values.items()), columns=[field, 'Count']).sort_values('Count', ascending=False) 
-        for field, values in statistics.items()}
-
-    # Print our statistics in separate tables
-    for field, df in dfs.items():
-        rprint(f'[bold]{field}[/bold]')
-        if field == 'tags':
-            print('(top 5)')
-            print(df.head(5).to_string(index=False))
+        proc = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'],
+                              cwd=directory_path, capture_output=True, text=True)
+    except OSError:
+        return None
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+
+def changed_files(directory_path, base_ref):
+    # files that differ from base_ref in the working tree, plus untracked files
+    diff = subprocess.run(['git', 'diff', '--name-only', '--relative', base_ref],
+                          cwd=directory_path, capture_output=True, text=True, check=True)
+    untracked = subprocess.run(['git', 'ls-files', '--others', '--exclude-standard'],
+                               cwd=directory_path, capture_output=True, text=True, check=True)
+    names = diff.stdout.splitlines() + untracked.stdout.splitlines()
+    return {os.path.normpath(name) for name in names if name}
+
+
+def validate_file(file_path, create=False):
+    reporter = ValidationReporter()
+    scan([read_prompt(file_path, SCHEMA)], [UUIDChecker(create), reporter])
+    return reporter
+
+
+def collect_records(directory_path, jobs=1, cache_path=None, since=None):
+    paths = find_prompts(directory_path)
+    cache, cache_commit = load_cache(cache_path, SCHEMA) if cache_path else ({}, None)
+
+    # git diff only proves a file matches since, so hashing is skipped only when the cache was written at since
+    changed = None
+    if since and cache_commit is not None and resolve_commit(directory_path, since) == cache_commit:
+        changed = changed_files(directory_path, since)
+
+    records = {}
+    to_check = []
+
+    # reuse cached results for files that haven't changed, only the rest are parsed
+    for file_path in paths:
+        key = os.path.relpath(file_path, directory_path)
+        cached = cache.get(key)
+
+        if cached is not None:
+            trusted = changed is not None and key not in changed and cached.get('clean')
+            if trusted or file_digest(file_path) == cached['hash']:
+                records[file_path] = Record(file_path, cached['data'], cached['error'], cached['hash'])
+                continue
+
+        to_check.append(file_path)
+
+    for record in read_prompts(to_check, SCHEMA, jobs):
+        records[record.path] = record
+        key = os.path.relpath(record.path, directory_path)
+        if record.digest is None:
+            cache.pop(key, None)
         else:
-            print(df.to_string(index=False))
-        print('\n')
+            data = summarize(record.data) if record.data is not None else None
+            cache[key] = {'hash': record.digest, 'data': data, 'error': record.error}
+
+    if cache_path:
+        # entries for files matching HEAD can later skip hashing when --since names this commit
+        commit = resolve_commit(directory_path, 'HEAD')
+        dirty = changed_files(directory_path, 'HEAD') if commit else set()
+
+        # drop deleted files so the cache doesn't grow forever
+        keys = {os.path.relpath(file_path, directory_path) for file_path in paths}
+        files = {key: dict(value, clean=commit is not None and key not in dirty)
+                 for key, value in cache.items() if key in keys}
+        save_cache(cache_path, SCHEMA, files, commit)
+
+    return [records[file_path] for file_path in paths]
+
+
+def validate_directory(directory_path, create=False, stats=None, jobs=1, cache_path=None, since=None):
+    # every file is parsed once, uuids are checked over the whole directory in walk order
+    reporter = ValidationReporter()
+    consumers = [UUIDChecker(create), reporter]
+    if stats is not None:
+        consumers.append(stats)
+
+    scan(collect_records(directory_path, jobs, cache_path, since), consumers)
+    return reporter
 
 
 if __name__ == '__main__':
@@ -135,6 +179,26 @@ if __name__ == '__main__':
         action='store_true'
     )
 
+    parser.add_argument(
+        '-j', '--jobs',
+        help='number of processes used to validate a directory',
+        required=False,
+        type=int,
+        default=1
+    )
+
+    parser.add_argument(
+        '--cache',
+        help='cache file for incremental validation, unchanged files are not re-validated',
+        required=False
+    )
+
+    parser.add_argument(
+        '--since',
+        help='git ref to diff against, only changed files are checked (requires --cache)',
+        required=False
+    )
+
     parser.add_argument(
         '-g', '--gen-stats',
         help='generate statistics from directory',
@@ -143,25 +207,49 @@ if __name__ == '__main__':
         action='store_true'
     )
 
+    parser.add_argument(
+        '--stats-format',
+        help='statistics output: table, json, csv (tidy field/value/category/count rows) or parquet',
+        required=False,
+        choices=StatsCollector.FORMATS,
+        default='table'
+    )
+
+    parser.add_argument(
+        '--stats-output',
+        help='file to write json, csv or parquet statistics to, required for those formats',
+        required=False
+    )
+
     args = parser.parse_args()
 
     if not os.path.exists(args.schema):
         rprint(f'[bold red](error)[/bold red] schema file {args.schema} does not exist.')
         sys.exit(1)
 
+    # status lines go to stdout, machine-readable stats would be mixed in with them
+    if args.gen_stats and args.stats_format != 'table' and not args.stats_output:
+        rprint(f'[bold red](error)[/bold red] --stats-format {args.stats_format} requires --stats-output')
+        sys.exit(1)
+
     SCHEMA_PATH = args.schema
+    SCHEMA = load_schema(SCHEMA_PATH)
     CREATE = args.create
     STATS = args.gen_stats
 
     if args.file:
         validate_file(args.file)
     elif args.directory:
-        validate_directory(args.directory, CREATE, STATS)
+        stats = StatsCollector() if STATS else None
+        reporter = validate_directory(args.directory, CREATE, stats, args.jobs, args.cache, args.since)
         if STATS:
             print('\n')
-            display_stats()
-        rprint(f'\n[bold]Passed:[/bold] {passed} prompts')
-        rprint(f'[bold red]Failed:[/bold red] {failed} prompts')
+            try:
+                stats.write(args.stats_format, args.stats_output)
+            except (ValueError, ImportError) as err:
+                rprint(f'[bold red](error)[/bold red] failed to write statistics: {err}')
+        rprint(f'\n[bold]Passed:[/bold] {reporter.passed} prompts')
+        rprint(f'[bold red]Failed:[/bold red] {reporter.failed} prompts')
     else:
         parser.print_help()
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# yamlio.py
+# github.com/deadbits/prompt-serve
+# shared YAML load/dump using the libyaml C bindings when PyYAML was built with them
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+    LIBYAML = False
+
+
+YAMLError = yaml.YAMLError
+
+
+def load(stream):
+    # drop-in replacement for yaml.safe_load
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    # drop-in replacement for yaml.dump / yaml.safe_dump
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)